@@ -1,620 +1,282 @@
 #!/usr/bin/env python
-from flask import Flask, render_template_string, request, jsonify
-from core.pdf_loader import load_pdf
-from core.embeddings import create_vector_store
-from core.chatbot import create_chatbot
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from core import metrics
+from core.admission import AdmissionQueue, ClientLimiter, Overloaded
+from core.assets import Asset, AssetStore
+from core.warmup import WARMUP_RETRY_AFTER, Warmup
 import os
+import json
+import logging
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
+logging.basicConfig(level=logging.INFO)
 
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Dow Hospital Chatbot</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        html, body { height: 100%; width: 100%; }
-        
-        body { 
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: linear-gradient(135deg, #0f172a 0%, #1e293b 50%, #0f172a 100%);
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            padding: 20px;
-            min-height: 100vh;
-        }
-        
-        .container {
-            width: 100%;
-            max-width: 500px;
-            height: 90vh;
-            background: white;
-            border-radius: 30px;
-            box-shadow: 0 25px 50px rgba(0, 0, 0, 0.4);
-            display: flex;
-            flex-direction: column;
-            overflow: hidden;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 50%, #ec4899 100%);
-            color: white;
-            padding: 20px;
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            flex-shrink: 0;
-        }
-        
-        .header-avatar {
-            width: 45px;
-            height: 45px;
-            border-radius: 50%;
-            background: rgba(255, 255, 255, 0.2);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 24px;
-        }
-        
-        .header-info h1 {
-            font-size: 18px;
-            margin: 0;
-            font-weight: 600;
-        }
-        
-        .header-info p {
-            font-size: 12px;
-            margin: 2px 0 0 0;
-            opacity: 0.9;
-        }
-        
-        .chat-box {
-            flex: 1;
-            overflow-y: auto;
-            padding: 16px;
-            background: #f8fafc;
-            display: flex;
-            flex-direction: column;
-            justify-content: flex-start;
-        }
-        
-        .message-group {
-            display: flex;
-            width: 100%;
-            margin-bottom: 12px;
-        }
-        
-        .message-group.user {
-            justify-content: flex-end;
-        }
-        
-        .message-group.bot {
-            justify-content: flex-start;
-        }
-        
-        .message-wrapper {
-            display: flex;
-            align-items: flex-end;
-            gap: 6px;
-            max-width: 75%;
-        }
-        
-        .message-group.user .message-wrapper {
-            flex-direction: row-reverse;
-            justify-content: flex-end;
-        }
-        
-        .bot-msg {
-            background: white;
-            color: #333;
-            padding: 12px 16px;
-            border-radius: 18px 18px 18px 4px;
-            word-wrap: break-word;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);
-            font-size: 15px;
-            line-height: 1.4;
-        }
-        
-        .user-msg {
-            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-            color: white;
-            padding: 12px 16px;
-            border-radius: 18px 18px 4px 18px;
-            word-wrap: break-word;
-            font-size: 15px;
-            line-height: 1.4;
-        }
-        
-        .msg-time {
-            font-size: 12px;
-            white-space: nowrap;
-            padding: 0 4px;
-            margin-bottom: 2px;
-        }
-        
-        .user-msg .msg-time {
-            color: rgba(255, 255, 255, 0.8);
-        }
-        
-        .bot-msg .msg-time {
-            color: #999;
-        }
-        
-        .date-separator {
-            text-align: center;
-            margin: 16px 0;
-            font-size: 12px;
-            color: #999;
-            font-weight: 500;
-        }
-        
-        .input-box {
-            display: flex;
-            gap: 8px;
-            padding: 12px 16px;
-            background: white;
-            border-top: 1px solid #eee;
-            align-items: flex-end;
-        }
-        
-        .input-icons {
-            display: flex;
-            gap: 6px;
-        }
-        
-        .input-icon-btn {
-            background: none;
-            border: none;
-            color: #3b82f6;
-            font-size: 20px;
-            cursor: pointer;
-            padding: 6px;
-            transition: all 0.2s ease;
-        }
-        
-        .input-icon-btn:hover {
-            color: #8b5cf6;
-            transform: scale(1.1);
-        }
-        
-        .input-wrapper {
-            flex: 1;
-            display: flex;
-            align-items: center;
-            background: #f0f0f0;
-            border-radius: 25px;
-            padding: 10px 16px;
-        }
-        
-        input#msg {
-            flex: 1;
-            border: none;
-            background: transparent;
-            font-size: 15px;
-            font-family: inherit;
-            outline: none;
-            color: #333;
-        }
-        
-        input#msg::placeholder {
-            color: #999;
-        }
-        
-        #send-btn {
-            width: 40px;
-            height: 40px;
-            border: none;
-            border-radius: 50%;
-            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-            color: white;
-            font-size: 18px;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        
-        #send-btn:hover {
-            transform: scale(1.1);
-        }
-        
-        .emoji-picker {
-            display: none;
-            position: absolute;
-            bottom: 80px;
-            right: 60px;
-            background: white;
-            border-radius: 15px;
-            box-shadow: 0 10px 40px rgba(0, 0, 0, 0.2);
-            padding: 12px;
-            z-index: 1000;
-            grid-template-columns: repeat(6, 1fr);
-            gap: 8px;
-            width: 280px;
-            max-height: 300px;
-            overflow-y: auto;
-        }
-        
-        .emoji-picker.show {
-            display: grid;
-        }
-        
-        .emoji-item {
-            font-size: 28px;
-            cursor: pointer;
-            padding: 8px;
-            border-radius: 8px;
-            text-align: center;
-            user-select: none;
-        }
-        
-        .emoji-item:hover {
-            background: #f0f0f0;
-            transform: scale(1.2);
-        }
-        
-        .camera-modal {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0, 0, 0, 0.9);
-            z-index: 2000;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-        }
-        
-        .camera-modal.show {
-            display: flex;
-        }
-        
-        .camera-container {
-            position: relative;
-            width: 100%;
-            max-width: 500px;
-            height: 600px;
-            background: #000;
-            border-radius: 15px;
-            overflow: hidden;
-        }
-        
-        #cameraVideo {
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-        }
-        
-        #cameraCanvas {
-            display: none;
-        }
-        
-        .camera-controls {
-            display: flex;
-            gap: 15px;
-            margin-top: 20px;
-            justify-content: center;
-        }
-        
-        .camera-btn {
-            padding: 12px 24px;
-            border: none;
-            border-radius: 25px;
-            font-size: 16px;
-            cursor: pointer;
-            font-weight: 600;
-        }
-        
-        .camera-btn.capture {
-            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-            color: white;
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            padding: 0;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 28px;
-        }
-        
-        .camera-btn.close {
-            background: rgba(255, 255, 255, 0.2);
-            color: white;
-            padding: 10px 20px;
-        }
-        
-        #fileInput {
-            display: none;
-        }
-        
-        .file-upload-indicator {
-            position: fixed;
-            bottom: 100px;
-            right: 20px;
-            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-            color: white;
-            padding: 12px 16px;
-            border-radius: 8px;
-            display: none;
-            z-index: 999;
-        }
-        
-        .file-upload-indicator.show {
-            display: block;
-        }
-        
-        @media (max-width: 600px) {
-            .container {
-                height: 100vh;
-                border-radius: 0;
-                max-width: 100%;
-            }
-            .bot-msg, .user-msg {
-                max-width: 85%;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="header-avatar">🏥</div>
-            <div class="header-info">
-                <h1>DOW Hospital</h1>
-                <p>🟢 Online</p>
-            </div>
-        </div>
-        
-        <div class="chat-box">
-            <div style="margin: auto;">
-                <div style="text-align: center; color: #999; font-size: 14px;">
-                    <div style="font-size: 40px; margin-bottom: 10px;">🏥</div>
-                    <div style="font-weight: 600; font-size: 16px; color: #333;">DOW Hospital Assistant</div>
-                    <div style="font-size: 13px; color: #999; margin-top: 8px;">Always here to help</div>
-                </div>
-            </div>
-        </div>
-        
-        <div class="input-box">
-            <div class="input-icons">
-                <button class="input-icon-btn" id="attachBtn"><i class="fas fa-paperclip"></i></button>
-                <button class="input-icon-btn" id="cameraBtn"><i class="fas fa-camera"></i></button>
-            </div>
-            <div class="input-wrapper">
-                <input id="msg" placeholder="Type your question..." />
-                <button class="input-icon-btn" id="emojiBtn"><i class="fas fa-smile"></i></button>
-            </div>
-            <button id="send-btn" onclick="send()"><i class="fas fa-paper-plane"></i></button>
-            <div class="emoji-picker" id="emojiPicker"></div>
-        </div>
-        
-        <input type="file" id="fileInput" />
-        
-        <div class="camera-modal" id="cameraModal">
-            <div class="camera-container">
-                <video id="cameraVideo" autoplay playsinline></video>
-                <canvas id="cameraCanvas"></canvas>
-            </div>
-            <div class="camera-controls">
-                <button class="camera-btn close" id="closeCameraBtn">Close</button>
-                <button class="camera-btn capture" id="captureBtn">📸</button>
-            </div>
-        </div>
-        
-        <div class="file-upload-indicator" id="uploadIndicator"></div>
-    </div>
-
-    <script>
-        const msgInput = document.getElementById("msg");
-        const chatBox = document.querySelector(".chat-box");
-        const emojiBtn = document.getElementById("emojiBtn");
-        const emojiPicker = document.getElementById("emojiPicker");
-        const cameraBtn = document.getElementById("cameraBtn");
-        const attachBtn = document.getElementById("attachBtn");
-        const fileInput = document.getElementById("fileInput");
-        const cameraModal = document.getElementById("cameraModal");
-        const cameraVideo = document.getElementById("cameraVideo");
-        const cameraCanvas = document.getElementById("cameraCanvas");
-        const captureBtn = document.getElementById("captureBtn");
-        const closeCameraBtn = document.getElementById("closeCameraBtn");
-        const uploadIndicator = document.getElementById("uploadIndicator");
-        
-        let lastMessageDate = null;
-        const emojis = ['😀', '😂', '😍', '🥰', '😢', '😭', '😱', '😎', '🤔', '👍', '❤️', '🎉', '🙏', '✨', '💯', '😃', '😄', '😁', '😆', '😅', '🤣', '😉', '😊', '😇', '🤩', '😘', '😗', '😚', '😙', '🥲', '😋', '😛', '😜', '🤪', '😌', '😔', '😑', '😐', '😏', '😒', '🙁', '😬', '😮', '😯', '😲', '😳', '🥺', '😦', '😧', '😨', '😰', '😥', '😞', '😓', '😩', '😫', '🥱', '😤', '😡', '😠', '💀', '💩', '🤡', '👹', '👻', '👽', '👾', '🤖', '💋', '💌', '💘', '💝', '💖', '💗', '💓', '💞', '💕'];
-        
-        function initEmojis() {
-            emojis.forEach(emoji => {
-                const item = document.createElement('div');
-                item.className = 'emoji-item';
-                item.textContent = emoji;
-                item.addEventListener('click', () => {
-                    msgInput.value += emoji;
-                    msgInput.focus();
-                    emojiPicker.classList.remove('show');
-                });
-                emojiPicker.appendChild(item);
-            });
-        }
-        
-        emojiBtn.addEventListener('click', (e) => {
-            e.preventDefault();
-            emojiPicker.classList.toggle('show');
-        });
-        
-        document.addEventListener('click', (e) => {
-            if (!emojiPicker.contains(e.target) && e.target !== emojiBtn && !emojiBtn.contains(e.target)) {
-                emojiPicker.classList.remove('show');
-            }
-        });
-        
-        cameraBtn.addEventListener('click', async (e) => {
-            e.preventDefault();
-            try {
-                const stream = await navigator.mediaDevices.getUserMedia({ video: { facingMode: 'user' } });
-                cameraVideo.srcObject = stream;
-                cameraModal.classList.add('show');
-            } catch (err) {
-                alert('Camera access denied.');
-            }
-        });
-        
-        closeCameraBtn.addEventListener('click', () => {
-            cameraVideo.srcObject.getTracks().forEach(track => track.stop());
-            cameraModal.classList.remove('show');
-        });
-        
-        captureBtn.addEventListener('click', () => {
-            const ctx = cameraCanvas.getContext('2d');
-            cameraCanvas.width = cameraVideo.videoWidth;
-            cameraCanvas.height = cameraVideo.videoHeight;
-            ctx.drawImage(cameraVideo, 0, 0);
-            addMessage('📷 Photo: ' + new Date().toLocaleTimeString(), true);
-            cameraVideo.srcObject.getTracks().forEach(track => track.stop());
-            cameraModal.classList.remove('show');
-        });
-        
-        attachBtn.addEventListener('click', (e) => {
-            e.preventDefault();
-            fileInput.click();
-        });
-        
-        fileInput.addEventListener('change', (e) => {
-            if (e.target.files.length > 0) {
-                const file = e.target.files[0];
-                uploadIndicator.textContent = '✅ ' + file.name;
-                uploadIndicator.classList.add('show');
-                addMessage('📎 ' + file.name, true);
-                setTimeout(() => uploadIndicator.classList.remove('show'), 3000);
-            }
-        });
-        
-        function getTime() {
-            const now = new Date();
-            return now.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
-        }
-        
-        function addMessage(text, isUser) {
-            const now = new Date();
-            const today = new Date();
-            const yesterday = new Date(today);
-            yesterday.setDate(yesterday.getDate() - 1);
-            
-            if (lastMessageDate !== now.toDateString()) {
-                let dateStr = 'Today';
-                if (now.toDateString() === yesterday.toDateString()) dateStr = 'Yesterday';
-                else if (now.getFullYear() !== today.getFullYear()) dateStr = now.toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
-                else dateStr = now.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
-                
-                const separator = document.createElement("div");
-                separator.className = "date-separator";
-                separator.textContent = dateStr;
-                chatBox.appendChild(separator);
-                lastMessageDate = now.toDateString();
-            }
-            
-            const messageGroup = document.createElement("div");
-            messageGroup.className = "message-group " + (isUser ? "user" : "bot");
-            
-            const wrapper = document.createElement("div");
-            wrapper.className = "message-wrapper";
-            
-            const msgDiv = document.createElement("div");
-            msgDiv.className = isUser ? "user-msg" : "bot-msg";
-            msgDiv.textContent = text;
-            
-            const timeDiv = document.createElement("div");
-            timeDiv.className = "msg-time";
-            timeDiv.textContent = getTime();
-            
-            wrapper.appendChild(msgDiv);
-            wrapper.appendChild(timeDiv);
-            messageGroup.appendChild(wrapper);
-            chatBox.appendChild(messageGroup);
-            chatBox.scrollTop = chatBox.scrollHeight;
-        }
-        
-        function send(){
-            let msg = msgInput.value.trim();
-            if(!msg) return;
-            addMessage(msg, true);
-            msgInput.value = "";
-            
-            fetch("/chat", {
-                method:"POST",
-                headers:{"Content-Type":"application/json"},
-                body:JSON.stringify({message:msg})
-            })
-            .then(res => res.json())
-            .then(data => addMessage(data.reply, false))
-            .catch(err => addMessage("Error: " + err, false));
-        }
-        
-        msgInput.addEventListener("keypress", (e) => {
-            if(e.key === "Enter" && !e.shiftKey) {
-                e.preventDefault();
-                send();
-            }
-        });
-        
-        initEmojis();
-    </script>
-</body>
-</html>
-'''
-
-app = Flask(__name__)
-
-print("Loading PDF...")
-try:
-    docs = load_pdf()
-    print(f"PDF loaded: {len(docs)} pages")
-    vector_db = create_vector_store(docs)
-    print("Vector store created")
+# The page is web/templates/index.html; its CSS, JS and icons in web/static are served by static_asset()
+app = Flask(__name__, static_folder=None, template_folder=os.path.join("web", "templates"))
+assets = AssetStore()
+page = None
+
+chatbot = None
+
+def load_chatbot():
+    # Runs on the warm-up thread; langchain/faiss/openai are imported here, not at server start
+    global chatbot
+    from core.embeddings import get_vector_store
+    from core.chatbot import create_chatbot
+
+    print("Loading vector store...")
+    vector_db = get_vector_store()
+    print(f"Vector store ready (index {vector_db.index_key})")
     chatbot = create_chatbot(vector_db)
     print("Chatbot ready!")
-except Exception as e:
-    print(f"ERROR: {e}")
-    chatbot = None
+    return chatbot
+
+warmup = Warmup(load_chatbot).start()
+metrics.Gauge("chatbot_ready", "1 once the index is loaded and /chat can answer",
+              function=lambda: {(): int(warmup.ready)})
+
+def not_ready():
+    # (message, headers) while the chatbot can't answer yet, else None
+    if warmup.ready:
+        return None
+    if warmup.state == "failed":
+        return "Chatbot not initialized", {}
+    return "The assistant is warming up, please try again in a few seconds.", {"Retry-After": str(WARMUP_RETRY_AFTER)}
+
+limiter = ClientLimiter()
+admission = AdmissionQueue()
+
+def admit(session_id=None, cost=1, slots=1):
+    # Rate-limits the client, then waits for slots; the caller must admission.release(slots)
+    limiter.acquire(session_id, request.remote_addr, request.headers.get("X-Forwarded-For"), cost)
+    admission.acquire(slots)
+
+def shed(error):
+    # (message, status, headers) for a request turned away by admit()
+    if error.status == 429:
+        message = "You're sending messages too quickly, please wait a moment and try again."
+    else:
+        message = "The assistant is busy right now, please try again in a few seconds."
+    return message, error.status, {"Retry-After": str(error.retry_after)}
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: the process is up and serving, whatever the index is doing
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: the index is loaded and /chat can answer
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+@app.before_request
+def start_request():
+    g.start = time.perf_counter()
+    g.request_id = metrics.start_request(request.headers.get("X-Request-ID"))
+
+@app.after_request
+def finish_request(response):
+    response.headers["X-Request-ID"] = g.request_id
+    # Streams are logged when they finish, and probes and scrapes aren't worth a log line
+    if request.endpoint in ("healthz", "readyz", "metrics_endpoint", "static_asset", "debug_intents"):
+        return response
+    if request.endpoint != "chat_stream" or response.status_code != 200:
+        metrics.log_request(request.path, response.status_code, time.perf_counter() - g.start)
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Debug routes echo users' questions back, so they're off unless DEBUG_ROUTES=1
+DEBUG_ROUTES = os.getenv("DEBUG_ROUTES", "0") == "1"
+
+@app.route("/debug/intents")
+def debug_intents():
+    # Fast-path hit rate and the questions it most often missed, to grow the fact table
+    if not DEBUG_ROUTES:
+        return jsonify({"error": "Not found"}), 404
+    if not warmup.ready or chatbot.router is None:
+        return jsonify({"error": "Intent router not loaded"}), 503
+    return jsonify(chatbot.router.report(request.args.get("n", 20, type=int)))
+
+def send_asset(asset, cache_control):
+    # Smallest encoding the browser accepts; 304 when it already has this version
+    encoding, body = asset.pick(request.headers.get("Accept-Encoding"))
+    etag = asset.etag(encoding)
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(body, mimetype=asset.mimetype, headers=headers)
+    response.set_etag(etag)
+    return response
 
 @app.route("/")
 def home():
-    return render_template_string(HTML_TEMPLATE)
+    # The page has no per-request content, so it's rendered once (with versioned asset URLs)
+    # and then served like a static file; the browser revalidates it with its ETag
+    global page
+    if page is None:
+        page = Asset(render_template("index.html", asset_url=assets.url).encode("utf-8"), "text/html")
+    return send_asset(page, "no-cache")
+
+@app.route("/static/<path:filename>")
+def static_asset(filename):
+    asset = assets.get(filename)
+    if asset is None:
+        return jsonify({"error": "Not found"}), 404
+    # URLs from the page carry the content hash, so that exact version never changes
+    if request.args.get("v") == asset.version:
+        return send_asset(asset, "public, max-age=31536000, immutable")
+    return send_asset(asset, "no-cache")
+
+# The read_* helpers take the parsed JSON body (None when it's missing or invalid), so the
+# ASGI /chat can use them outside a Flask request
+
+def read_message(data):
+    # Returns (message, error) from the JSON body
+    if not chatbot:
+        return None, "Error: Chatbot not initialized"
+    
+    if not isinstance(data, dict) or "message" not in data:
+        return None, "Error: No message"
+    
+    user_msg = str(data["message"]).strip()
+    if not user_msg:
+        return None, "Error: Empty message"
+    return user_msg, None
+
+def read_session(data, headers):
+    # Conversation key: "session_id" in the JSON body or an X-Session-ID header
+    session_id = (data.get("session_id") if isinstance(data, dict) else None) or headers.get("X-Session-ID")
+    return str(session_id)[:128] if session_id else None
+
+def read_mode(data):
+    # Optional "mode": "llm", "extractive" (answer with a sentence from the PDF, no LLM) or "auto"
+    mode = data.get("mode") if isinstance(data, dict) else None
+    return str(mode) if mode else None
 
 @app.route("/chat", methods=["POST"])
 def chat():
+    warming = not_ready()
+    if warming:
+        return jsonify({"reply": warming[0]}), 503, warming[1]
+    data = request.get_json(silent=True)
+    session_id = read_session(data, request.headers)
     try:
-        if not chatbot:
-            return jsonify({"reply": "Error: Chatbot not initialized"})
-        
-        data = request.get_json()
-        if not data or "message" not in data:
-            return jsonify({"reply": "Error: No message"})
-        
-        user_msg = data["message"].strip()
-        if not user_msg:
-            return jsonify({"reply": "Error: Empty message"})
+        admit(session_id)
+    except Overloaded as e:
+        message, status, headers = shed(e)
+        return jsonify({"reply": message}), status, headers
+    try:
+        user_msg, error = read_message(data)
+        if error:
+            return jsonify({"reply": error})
         
-        print(f"User: {user_msg}")
-        result = chatbot.invoke({"query": user_msg})
+        metrics.note("query", user_msg)
+        result = chatbot.invoke({"query": user_msg, "session_id": session_id, "mode": read_mode(data)})
         answer = result.get("result", "I don't have an answer").strip()
         
-        print(f"Bot: {answer}")
+        metrics.note("answer_chars", len(answer))
         return jsonify({"reply": answer})
         
     except Exception as e:
-        print(f"Error: {e}")
+        metrics.note("error", str(e))
         return jsonify({"reply": f"Error: {str(e)}"})
+    finally:
+        admission.release()
+
+# Largest number of questions accepted by /chat/batch in one request
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "100"))
+
+@app.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    # {"messages": [...]} -> {"replies": [{"reply": ...} or {"error": ...}, ...]} in input order
+    warming = not_ready()
+    if warming:
+        return jsonify({"error": warming[0]}), 503, warming[1]
+    
+    data = request.get_json(silent=True)
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "No messages"}), 400
+    if len(messages) > BATCH_MAX_MESSAGES:
+        return jsonify({"error": f"At most {BATCH_MAX_MESSAGES} messages per batch"}), 400
+    
+    from core.chatbot import BATCH_CONCURRENCY
+
+    metrics.note("batch_size", len(messages))
+    # Each question spends a token, and each question answered at once holds a slot
+    slots = min(len(messages), BATCH_CONCURRENCY)
+    try:
+        admit(read_session(data, request.headers), cost=len(messages), slots=slots)
+    except Overloaded as e:
+        message, status, headers = shed(e)
+        return jsonify({"error": message}), status, headers
+    try:
+        results = chatbot.batch([{"query": str(msg), "mode": read_mode(data)} for msg in messages])
+    finally:
+        admission.release(slots)
+    replies = []
+    for result in results:
+        if "error" in result:
+            replies.append({"error": result["error"]})
+        else:
+            replies.append({"reply": result["result"].strip()})
+    return jsonify({"replies": replies})
+
+def sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    # Server-Sent Events: one {"token": ...} event per LLM chunk, then a "done" event
+    warming = not_ready()
+    if warming:
+        return Response(sse({"error": warming[0]}, event="error"), status=503,
+                        mimetype="text/event-stream", headers=warming[1])
+    data = request.get_json(silent=True)
+    user_msg, error = read_message(data)
+    session_id = read_session(data, request.headers)
+    mode = read_mode(data)
+    start = g.start
+    try:
+        admit(session_id)
+    except Overloaded as e:
+        message, status, headers = shed(e)
+        return Response(sse({"error": message}, event="error"), status=status,
+                        mimetype="text/event-stream", headers=headers)
+
+    def events():
+        if error:
+            yield sse({"error": error}, event="error")
+            return
+        metrics.note("query", user_msg)
+        answer = []
+        try:
+            for token in chatbot.stream({"query": user_msg, "session_id": session_id, "mode": mode}):
+                if not answer:
+                    metrics.note("first_token_ms", round((time.perf_counter() - start) * 1000, 3))
+                answer.append(token)
+                yield sse({"token": token})
+            yield sse({}, event="done")
+        except Exception as e:
+            metrics.note("error", str(e))
+            yield sse({"error": str(e)}, event="error")
+        metrics.note("answer_chars", len("".join(answer)))
+        metrics.log_request("/chat/stream", 200, time.perf_counter() - start)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream_with_context(events()), mimetype="text/event-stream", headers=headers)
+    # The slot is held until the stream ends, and freed even if the client leaves before it starts
+    response.call_on_close(admission.release)
+    return response
 
 if __name__ == "__main__":
     print("Starting: http://127.0.0.1:5000")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# ASGI entry point with an async /chat:  uvicorn asgi:app --host 127.0.0.1 --port 5000
+# Every other route (the page, /chat/stream) is served by the Flask app from app.py.
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as flask_app
+from core import metrics
+from core.admission import AsyncAdmissionQueue, Overloaded
+
+wsgi_app = WsgiToAsgi(flask_app.app)
+# Shares the Flask app's per-client buckets; the queue is this event loop's own (ASGI_ADMISSION_* settings)
+admission = AsyncAdmissionQueue()
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+async def send_json(send, payload, status=200, headers=None):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-request-id", (metrics.current_request_id() or "").encode()),
+        ] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def chat(scope, receive, send):
+    # Same contract as the Flask /chat route, but awaits the upstream calls
+    start = time.perf_counter()
+    headers = dict(scope.get("headers") or [])
+    metrics.start_request(headers.get(b"x-request-id", b"").decode() or None)
+    warming = flask_app.not_ready()
+    if warming:
+        await send_json(send, {"reply": warming[0]}, 503, warming[1])
+        return metrics.log_request("/chat", 503, time.perf_counter() - start)
+    try:
+        data = await read_json(receive)
+        session_id = flask_app.read_session(data, {"X-Session-ID": headers.get(b"x-session-id", b"").decode()})
+        client = (scope.get("client") or (None,))[0]
+        flask_app.limiter.acquire(session_id, client, headers.get(b"x-forwarded-for", b"").decode())
+        async with admission.slot():
+            user_msg, error = flask_app.read_message(data)
+            if error:
+                await send_json(send, {"reply": error})
+            else:
+                metrics.note("query", user_msg)
+                result = await flask_app.chatbot.ainvoke({"query": user_msg, "session_id": session_id,
+                                                          "mode": flask_app.read_mode(data)})
+                answer = result.get("result", "I don't have an answer").strip()
+
+                metrics.note("answer_chars", len(answer))
+                await send_json(send, {"reply": answer})
+    except Overloaded as e:
+        message, status, shed_headers = flask_app.shed(e)
+        await send_json(send, {"reply": message}, status, shed_headers)
+        return metrics.log_request("/chat", status, time.perf_counter() - start)
+    except Exception as e:
+        metrics.note("error", str(e))
+        await send_json(send, {"reply": f"Error: {str(e)}"})
+    metrics.log_request("/chat", 200, time.perf_counter() - start)
+
+async def app(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == "/chat" and scope["method"] == "POST":
+        await chat(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
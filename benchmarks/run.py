@@ -0,0 +1,126 @@
+# benchmarks/run.py
+# Offline benchmarks with stub embeddings and a fake LLM (no OpenAI credits, no network):
+#   python -m benchmarks.run --sizes 10,100,1000,10000,100000 --llm-latency 0.5 --out bench.json
+import argparse
+import atexit
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Keep the embedding cache and indexes of a benchmark run out of data/index
+if "INDEX_DIR" not in os.environ:
+    os.environ["INDEX_DIR"] = tempfile.mkdtemp(prefix="hospital-bench-")
+    atexit.register(shutil.rmtree, os.environ["INDEX_DIR"], True)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-offline")
+
+from core import chunker
+from core.chatbot import create_chatbot
+from core.embeddings import INDEX_TYPE, create_vector_store
+from core.pdf_loader import load_pdf
+from benchmarks.stubs import (
+    FakeChatModel, HashEmbeddings, synthetic_pages, synthetic_queries, write_synthetic_pdf,
+)
+
+def tokenizer_name():
+    # chunker falls back to approximate counts when tiktoken's BPE file can't be downloaded
+    encoding = chunker.get_encoding()
+    return "approx" if isinstance(encoding, chunker.ApproxEncoding) else "tiktoken"
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round(time.perf_counter() - start, 6)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def run_size(size, args, workdir):
+    result = {"pages": size}
+    if size <= args.max_parse_pages:
+        pdf_path = os.path.join(workdir, f"synthetic-{size}.pdf")
+        write_synthetic_pdf(pdf_path, size, args.lines_per_page)
+        pages, result["parse_s"] = timed(load_pdf, pdf_path)
+        os.remove(pdf_path)
+    else:
+        # Too big to generate and parse in reasonable time; build from in-memory pages
+        pages, result["parse_s"] = list(synthetic_pages(size, args.lines_per_page)), None
+
+    embeddings = HashEmbeddings(args.dim)
+    vector_db, result["build_s"] = timed(create_vector_store, iter(pages), embeddings)
+    result["chunks"] = vector_db.index.ntotal
+    del pages
+
+    chatbot = create_chatbot(vector_db, llm=FakeChatModel(latency=args.llm_latency))
+    queries = synthetic_queries(args.queries * 2)
+    retrieval = [timed(chatbot.retriever.invoke, q)[1] for q in queries[:args.queries]]
+    # Distinct queries so the answer cache doesn't turn this into a cache benchmark
+    invoke = [timed(chatbot.invoke, {"query": q})[1] for q in queries[args.queries:]]
+    result["retrieval"] = summarize(retrieval)
+    result["invoke"] = summarize(invoke)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks on synthetic corpora.")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="corpus sizes in pages (about one chunk each)")
+    parser.add_argument("--queries", type=int, default=50, help="queries per latency measurement")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake LLM sleeps per call")
+    parser.add_argument("--dim", type=int, default=256, help="stub embedding size")
+    parser.add_argument("--lines-per-page", type=int, default=12)
+    parser.add_argument("--max-parse-pages", type=int, default=2000, help="largest corpus written to and parsed from a PDF")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "settings": {
+            "tokenizer": tokenizer_name(),
+            "chunking": chunker.chunk_settings(),
+            "index_type": INDEX_TYPE,
+            "embedding_dim": args.dim,
+            "llm_latency_s": args.llm_latency,
+            "queries": args.queries,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            result = run_size(size, args, workdir)
+            report["results"].append(result)
+            print(f"{size} pages: {result['chunks']} chunks, build {result['build_s']:.2f}s, "
+                  f"retrieval p50 {result['retrieval']['p50_ms']}ms, invoke p50 {result['invoke']['p50_ms']}ms",
+                  file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+# benchmarks/stubs.py
+# Offline stand-ins for OpenAIEmbeddings / ChatOpenAI and a synthetic corpus generator
+import random
+import re
+import time
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+WORDS = (
+    "hospital patient doctor ward clinic opd emergency department cardiology neurology pediatrics surgery "
+    "orthopedics radiology pathology pharmacy laboratory appointment consultation fee timings monday tuesday "
+    "wednesday thursday friday saturday sunday morning evening floor block room bed nurse admission discharge "
+    "insurance billing reception contact extension number available visit report test blood scan xray mri "
+    "specialist professor consultant schedule closed open hours week month service facility ambulance"
+).split()
+
+class HashEmbeddings(Embeddings):
+    # Deterministic bag-of-words feature hashing; same text -> same unit vector, no network
+    def __init__(self, size=256):
+        self.size = size
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(token.encode())
+            vector[h % self.size] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+class FakeChatModel(BaseChatModel):
+    # Sleeps for `latency` seconds, then answers with a fixed reply
+    latency: float = 0.0
+    reply: str = "This is a benchmark answer."
+
+    @property
+    def _llm_type(self):
+        return "fake-benchmark"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(8, 16))
+    words.insert(rng.randrange(len(words)), str(rng.randint(1, 9999)))
+    return " ".join(words).capitalize() + "."
+
+def synthetic_pages(count, lines_per_page=20, seed=0):
+    # Page Documents shaped like PyPDFLoader output
+    rng = random.Random(seed)
+    for page in range(count):
+        lines = [sentence(rng) for _ in range(lines_per_page)]
+        yield Document(page_content="\n".join(lines), metadata={"source": "synthetic.pdf", "page": page})
+
+def synthetic_queries(count, seed=1):
+    rng = random.Random(seed)
+    return [f"What about {' '.join(rng.choices(WORDS, k=rng.randint(3, 7)))}?" for _ in range(count)]
+
+def write_synthetic_pdf(path, pages, lines_per_page=20, seed=0):
+    # Minimal hand-written PDF (Helvetica text, one content stream per page) so load_pdf can be timed
+    # without a PDF library
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for doc in synthetic_pages(pages, lines_per_page, seed):
+        text = "".join(
+            f"({line.replace(chr(92), '').replace('(', '').replace(')', '')}) Tj T* " for line in doc.page_content.splitlines()
+        )
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {text}ET".encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode("latin-1") + stream + b"\nendstream")
+        kids.append(len(objects) + 1)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>"
+        )
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        body = body if isinstance(body, bytes) else body.encode("latin-1")
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
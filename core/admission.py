@@ -0,0 +1,211 @@
+# core/admission.py
+# Overload protection for the chat endpoints: a token bucket per client, and a bounded queue in
+# front of the chatbot so excess requests are turned away quickly (with Retry-After) instead of
+# piling up behind OpenAI until everything times out.
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+from core import metrics
+
+# Sustained requests per minute per client, and how many may come at once
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+# Every client address is charged too, whatever session ids it sends; sized for a ward of users
+# sharing one NAT address
+RATE_LIMIT_ADDRESS_PER_MINUTE = float(os.getenv("RATE_LIMIT_ADDRESS_PER_MINUTE", "120"))
+RATE_LIMIT_ADDRESS_BURST = float(os.getenv("RATE_LIMIT_ADDRESS_BURST", "40"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Behind a reverse proxy every request comes from the proxy; take the client from X-Forwarded-For
+TRUST_PROXY = os.getenv("TRUST_PROXY", "0") == "1"
+# Questions answered at once per process, requests allowed to wait, and for how long
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+# The ASGI /chat waits on OpenAI without holding a thread, so its queue is sized against the
+# upstream cap (MAX_UPSTREAM_CALLS, read here to keep the chatbot's imports off the startup path):
+# twice that many at once by default, since cache hits and extractive answers never call upstream
+ASGI_ADMISSION_MAX_CONCURRENT = (int(os.getenv("ASGI_ADMISSION_MAX_CONCURRENT", "0"))
+                                 or 2 * int(os.getenv("MAX_UPSTREAM_CALLS", "32")))
+ASGI_ADMISSION_MAX_QUEUE = int(os.getenv("ASGI_ADMISSION_MAX_QUEUE", "512"))
+ASGI_ADMISSION_MAX_WAIT = float(os.getenv("ASGI_ADMISSION_MAX_WAIT", str(ADMISSION_MAX_WAIT)))
+# Retry-After (seconds) when the queue turns a request away
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+SHED = metrics.Counter("chatbot_shed_total", "Requests turned away by the rate limiter or admission queue", ["reason"])
+_queues = []
+
+def _queue_depths():
+    return {(queue.name,): queue.waiting for queue in _queues}
+
+def _in_flight():
+    return {(queue.name,): queue.active for queue in _queues}
+
+QUEUE_DEPTH = metrics.Gauge("chatbot_queue_depth", "Requests waiting for an admission slot", ["path"], function=_queue_depths)
+IN_FLIGHT = metrics.Gauge("chatbot_in_flight", "Requests holding an admission slot", ["path"], function=_in_flight)
+
+def client_keys(session_id, remote_addr, forwarded_for=None):
+    # (address key, client key). The client is the conversation when one is sent, else the address.
+    # Session ids are chosen by the client, so they only split an address's budget, never add to it.
+    if TRUST_PROXY and forwarded_for:
+        remote_addr = forwarded_for.split(",")[0].strip()
+    address = f"ip:{remote_addr or 'unknown'}"
+    return address, (f"session:{session_id}" if session_id else address)
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after, status):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status = status
+        SHED.inc(reason=reason)
+        metrics.note("shed", reason)
+
+class RateLimiter:
+    # Token bucket per client key; least recently seen clients are forgotten beyond max_clients
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cost=1):
+        # Takes cost tokens or raises Overloaded (429) with the time until they'd be available.
+        # A cost above the burst (a batch) is let through on a full bucket and leaves it in debt,
+        # so the client pays for every question before its next request.
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            needed = min(cost, self.burst)
+            allowed = tokens >= needed
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            raise Overloaded("rate_limited", (needed - tokens) / self.rate, 429)
+
+    def refund(self, key, cost=1):
+        # Gives back tokens taken for a request that another limit turned away
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if key in self._buckets:
+                tokens, last = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + cost), last)
+
+class ClientLimiter:
+    # Charges both the client's address and the client (its conversation, if it sent one); a
+    # request refused by either limit spends nothing
+    def __init__(self, address=None, client=None):
+        self.address = address if address is not None else RateLimiter(RATE_LIMIT_ADDRESS_PER_MINUTE, RATE_LIMIT_ADDRESS_BURST)
+        self.client = client if client is not None else RateLimiter()
+
+    def acquire(self, session_id, remote_addr, forwarded_for=None, cost=1):
+        address, client = client_keys(session_id, remote_addr, forwarded_for)
+        self.address.acquire(address, cost)
+        try:
+            self.client.acquire(client, cost)
+        except Overloaded:
+            self.address.refund(address, cost)
+            raise
+
+class AdmissionQueue:
+    # At most max_concurrent slots are taken; up to max_queue more requests wait at most max_wait
+    # seconds. Anything beyond is refused at once, so latency stays bounded under overload. A
+    # request that runs several questions at once (a batch) takes one slot per concurrent question.
+    def __init__(self, name="sync", max_concurrent=ADMISSION_MAX_CONCURRENT, max_queue=ADMISSION_MAX_QUEUE,
+                 max_wait=ADMISSION_MAX_WAIT):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._changed = threading.Condition()
+        _queues.append(self)
+
+    def weight(self, slots):
+        return min(max(1, slots), self.max_concurrent)
+
+    def acquire(self, slots=1):
+        # The caller must release() the same number of slots
+        slots = self.weight(slots)
+        start = time.perf_counter()
+        with self._changed:
+            if self.active + slots > self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    raise Overloaded("queue_full", ADMISSION_RETRY_AFTER, 503)
+                self.waiting += 1
+                try:
+                    admitted = self._changed.wait_for(lambda: self.active + slots <= self.max_concurrent, self.max_wait)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    raise Overloaded("queue_timeout", ADMISSION_RETRY_AFTER, 503)
+            self.active += slots
+        waited = time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(waited, stage="admission_wait")
+        metrics.note("queued_ms", round(waited * 1000, 3))
+
+    def release(self, slots=1):
+        with self._changed:
+            self.active -= self.weight(slots)
+            self._changed.notify_all()
+
+    @contextmanager
+    def slot(self, slots=1):
+        self.acquire(slots)
+        try:
+            yield
+        finally:
+            self.release(slots)
+
+class AsyncAdmissionQueue:
+    # Same policy for coroutines on one event loop (ASGI)
+    def __init__(self, name="async", max_concurrent=ASGI_ADMISSION_MAX_CONCURRENT, max_queue=ASGI_ADMISSION_MAX_QUEUE,
+                 max_wait=ASGI_ADMISSION_MAX_WAIT):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._slots = None
+        _queues.append(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        start = time.perf_counter()
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                raise Overloaded("queue_full", ADMISSION_RETRY_AFTER, 503)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise Overloaded("queue_timeout", ADMISSION_RETRY_AFTER, 503) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        waited = time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(waited, stage="admission_wait")
+        metrics.note("queued_ms", round(waited * 1000, 3))
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
@@ -0,0 +1,98 @@
+# core/ann_report.py
+# Recall vs latency of the ANN index types against exact (flat) search:
+#   python -m core.ann_report                      # vectors of the current PDF's index
+#   python -m core.ann_report --synthetic 1000000  # random vectors, to plan for a large corpus
+import argparse
+import json
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.embeddings import (
+    INDEX_HNSW_M, INDEX_NLIST, INDEX_PQ_M, build_ann_index, get_vector_store, set_search_params,
+)
+from core.pdf_loader import DEFAULT_SOURCE
+
+def corpus_vectors(source):
+    # Re-read every chunk's vector through the embedding cache (all hits, no provider calls)
+    vector_db = get_vector_store(source)
+    ids = [vector_db.index_to_docstore_id[i] for i in range(len(vector_db.index_to_docstore_id))]
+    texts = [vector_db.docstore.search(doc_id).page_content for doc_id in ids]
+    return np.asarray(vector_db.embeddings.embed_documents(texts), dtype=np.float32)
+
+def sample_queries(vectors, count, rng):
+    # Corpus vectors with noise stand in for real queries near the documents
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    noise = rng.normal(0, picks.std() * 0.5, picks.shape).astype(np.float32)
+    return picks + noise
+
+def measure(index, queries, k, truth):
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+    latencies = np.asarray(latencies)
+    return {
+        "recall": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against flat search.")
+    parser.add_argument("--source", "--pdf", default=DEFAULT_SOURCE, help="PDF or directory whose index vectors are used")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the PDF")
+    parser.add_argument("--dim", type=int, default=1536, help="vector size for --synthetic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--types", default="hnsw,ivf,ivfpq")
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    parser.add_argument("--ef-search", default="16,32,64,128,256")
+    parser.add_argument("--nlist", type=int, default=INDEX_NLIST)
+    parser.add_argument("--pq-m", type=int, default=INDEX_PQ_M, help="PQ sub-quantizers, must divide the vector size")
+    parser.add_argument("--hnsw-m", type=int, default=INDEX_HNSW_M)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        vectors = rng.standard_normal((args.synthetic, args.dim), dtype=np.float32)
+    else:
+        load_dotenv()
+        vectors = corpus_vectors(args.source)
+    queries = sample_queries(vectors, args.queries, rng)
+    k = min(args.k, len(vectors))
+
+    flat = build_ann_index(vectors, "flat")
+    _, truth = flat.search(queries, k)
+    rows = [dict(type="flat", param="-", build_s=0.0, **measure(flat, queries, k, truth))]
+
+    for index_type in args.types.split(","):
+        start = time.perf_counter()
+        index = build_ann_index(vectors, index_type, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+        build_s = round(time.perf_counter() - start, 2)
+        if index_type == "hnsw":
+            settings = [("efSearch", int(v), dict(ef_search=int(v))) for v in args.ef_search.split(",")]
+        else:
+            settings = [("nprobe", int(v), dict(nprobe=int(v))) for v in args.nprobe.split(",")]
+        for name, value, params in settings:
+            set_search_params(index, **params)
+            rows.append(dict(type=index_type, param=f"{name}={value}", build_s=build_s,
+                             **measure(index, queries, k, truth)))
+
+    if args.json:
+        print(json.dumps({"vectors": len(vectors), "queries": len(queries), "k": k, "results": rows}, indent=2))
+        return 0
+    print(f"{len(vectors)} vectors, {len(queries)} queries, recall@{k} vs flat")
+    print(f"{'type':<7}{'param':<15}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'build s':>9}")
+    for row in rows:
+        print(f"{row['type']:<7}{row['param']:<15}{row['recall']:>8.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['build_s']:>9.2f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
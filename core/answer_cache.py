@@ -0,0 +1,140 @@
+# core/answer_cache.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Cosine similarity above which a different wording counts as the same question
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
+def normalize_query(query):
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+class _Entry:
+    __slots__ = ("answer", "vector", "expires", "size")
+
+    def __init__(self, answer, vector, expires, size):
+        self.answer = answer
+        self.vector = vector
+        self.expires = expires
+        self.size = size
+
+class AnswerCache:
+    # Two tiers: exact match on the normalized query, then nearest cached query by embedding.
+    # LRU + TTL eviction, bounded by entry count and approximate bytes.
+    def __init__(self, embed=None, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 max_bytes=ANSWER_CACHE_MAX_BYTES, threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.embed = embed
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Stacked vectors for the semantic tier, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_keys = []
+
+    def lookup(self, query, vector=None, embed=True):
+        # Returns (answer or None, query vector or None); pass the vector back to put() on a miss.
+        # Callers that already embedded the query can pass its raw vector to skip the embed call;
+        # embed=False limits the lookup to the exact tier.
+        hit = self.exact(query)
+        if hit is not None:
+            return hit
+        now = time.monotonic()
+        with self._lock:
+            has_vectors = any(e.vector is not None for e in self._entries.values())
+
+        if vector is not None:
+            vector = self._normalize(vector)
+        elif embed and self.embed:
+            vector = self._normalize(self.embed(query))
+        if vector is not None and has_vectors:
+            with self._lock:
+                match = self._nearest(vector, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.stats["semantic_hits"] += 1
+                    return self._entries[match].answer, vector
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, vector
+
+    def exact(self, query):
+        # (answer, vector) from the exact tier, or None; a miss here isn't counted, since the
+        # caller goes on to lookup()
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry.answer, entry.vector
+
+    def put(self, query, answer, vector=None):
+        key = normalize_query(query)
+        if not key or not answer:
+            return
+        size = len(key) + len(answer) + (vector.nbytes if vector is not None else 0) + 200
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(answer, vector, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+            self._matrix = None
+
+    def invalidate(self):
+        # Called whenever the vector index is rebuilt; cached answers may be stale
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires < now:
+            self._drop(key)
+            return None
+        return entry
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._matrix = None
+
+    def _nearest(self, vector, now):
+        if self._matrix is None:
+            self._matrix_keys = [k for k, e in self._entries.items() if e.vector is not None]
+            if not self._matrix_keys:
+                return None
+            self._matrix = np.vstack([self._entries[k].vector for k in self._matrix_keys])
+        scores = self._matrix @ vector
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                return None
+            key = self._matrix_keys[i]
+            if self._live(key, now) is not None:
+                return key
+        return None
@@ -0,0 +1,71 @@
+# core/assets.py
+# Front-end files from web/static, held in memory. Each is read and compressed once at startup
+# (gzip, plus brotli when the brotli package is installed) and tagged with a content hash, used
+# both as its ETag and as the ?v= in its URL so browsers can cache it until it changes.
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(os.path.dirname(__file__), "..", "web", "static"))
+# Files smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "256"))
+
+def accepted_encodings(header):
+    # Content codings from an Accept-Encoding header, without the ones refused with q=0
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+class Asset:
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {"identity": body}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+
+    def pick(self, accept_encoding):
+        # (encoding, body): the smallest variant the client accepts
+        accepted = accepted_encodings(accept_encoding)
+        if "*" in accepted:
+            accepted.update(self.variants)
+        encoding = min((e for e in self.variants if e == "identity" or e in accepted),
+                       key=lambda e: len(self.variants[e]))
+        return encoding, self.variants[encoding]
+
+    def etag(self, encoding):
+        # Each variant is a different representation, so each gets its own tag
+        return self.version if encoding == "identity" else f"{self.version}-{encoding}"
+
+class AssetStore:
+    def __init__(self, folder=STATIC_DIR):
+        self.assets = {}
+        for root, _, files in os.walk(folder):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    self.add(name, f.read())
+
+    def add(self, name, body, mimetype=None):
+        mimetype = mimetype or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.assets[name] = asset = Asset(body, mimetype)
+        return asset
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def url(self, name):
+        return f"/static/{name}?v={self.assets[name].version}"
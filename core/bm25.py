@@ -0,0 +1,138 @@
+# core/bm25.py
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+class BM25Index:
+    # Inverted index over the same chunks as the FAISS store, keyed by docstore id
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lens = []
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.total_len = 0
+
+    @classmethod
+    def from_vector_store(cls, vector_db):
+        # For indexes saved before the BM25 index was persisted alongside them
+        index = cls()
+        for i in range(len(vector_db.index_to_docstore_id)):
+            doc_id = vector_db.index_to_docstore_id[i]
+            index.add(doc_id, vector_db.docstore.search(doc_id).page_content)
+        return index
+
+    def add(self, doc_id, text):
+        terms = Counter(tokenize(text))
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        length = sum(terms.values())
+        self.doc_lens.append(length)
+        self.total_len += length
+        for term, tf in terms.items():
+            self.postings[term].append((doc, tf))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def idf(self, term):
+        n, df = len(self.doc_ids), len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=4):
+        # Returns [(doc_id, score)] best first; empty when no query term is indexed
+        n = len(self.doc_ids)
+        if not n:
+            return []
+        avg_len = self.total_len / n
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc] / avg_len)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[doc], score) for doc, score in best]
+
+def write_bm25(folder, index):
+    # Postings as flat arrays (term -> [start, end) slice), so MappedBM25Index can map them
+    terms, docs, tfs = {}, [], []
+    for term, postings in index.postings.items():
+        terms[term] = [len(docs), len(docs) + len(postings)]
+        for doc, tf in postings:
+            docs.append(doc)
+            tfs.append(tf)
+    width = max([len(doc_id.encode("utf-8")) for doc_id in index.doc_ids] or [1])
+    np.save(os.path.join(folder, "bm25.docs.npy"), np.array(docs, dtype=np.int32))
+    np.save(os.path.join(folder, "bm25.tfs.npy"), np.array(tfs, dtype=np.float32))
+    np.save(os.path.join(folder, "bm25.lens.npy"), np.array(index.doc_lens, dtype=np.float32))
+    np.save(os.path.join(folder, "bm25.ids.npy"), np.array([i.encode("utf-8") for i in index.doc_ids], dtype=f"S{width}"))
+    with open(os.path.join(folder, "bm25.json"), "w") as f:
+        json.dump({"k1": index.k1, "b": index.b, "total_len": index.total_len, "terms": terms}, f)
+
+MAPPED_FILES = ("bm25.json", "bm25.docs.npy", "bm25.tfs.npy", "bm25.lens.npy", "bm25.ids.npy")
+
+def has_bm25(folder):
+    return all(os.path.exists(os.path.join(folder, name)) for name in MAPPED_FILES)
+
+class MappedBM25Index:
+    # Read-only BM25Index over memory-mapped arrays: shared between worker processes, and
+    # scored with NumPy instead of a Python loop per posting. Only the vocabulary is per process.
+    def __init__(self, folder):
+        with open(os.path.join(folder, "bm25.json")) as f:
+            meta = json.load(f)
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.total_len = meta["total_len"]
+        self.terms = meta["terms"]
+        self._docs = np.load(os.path.join(folder, "bm25.docs.npy"), mmap_mode="r")
+        self._tfs = np.load(os.path.join(folder, "bm25.tfs.npy"), mmap_mode="r")
+        self._lens = np.load(os.path.join(folder, "bm25.lens.npy"), mmap_mode="r")
+        self._ids = np.load(os.path.join(folder, "bm25.ids.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self._lens)
+
+    def idf(self, term):
+        start, end = self.terms.get(term, (0, 0))
+        n, df = len(self._lens), end - start
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=4):
+        # Same scores and contract as BM25Index.search
+        n = len(self._lens)
+        if not n:
+            return []
+        avg_len = self.total_len / n
+        scores = None
+        for term in set(tokenize(query)):
+            span = self.terms.get(term)
+            if span is None:
+                continue
+            start, end = span
+            docs, tfs = self._docs[start:end], self._tfs[start:end]
+            idf = math.log(1 + (n - (end - start) + 0.5) / (end - start + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lens[docs] / avg_len)
+            if scores is None:
+                scores = np.zeros(n, dtype=np.float64)
+            # A document appears once per term, so plain fancy-index += is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if scores is None:
+            return []
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        best = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self._ids[doc].decode("utf-8"), float(scores[doc])) for doc in best]
@@ -0,0 +1,32 @@
+# core/build_index.py
+# Offline index builder, e.g. for CI:  python -m core.build_index [--source PDF_OR_DIR] [--force]
+import argparse
+import logging
+import time
+
+from dotenv import load_dotenv
+
+from core.pdf_loader import DEFAULT_SOURCE, iter_documents
+from core.embeddings import create_vector_store, index_exists, index_key, index_path, save_vector_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the FAISS index for the hospital PDFs ahead of time.")
+    parser.add_argument("--source", "--pdf", default=DEFAULT_SOURCE, help="PDF file or directory of PDFs to index")
+    parser.add_argument("--force", action="store_true", help="rebuild even if a matching index exists")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    key = index_key(args.source)
+    if not args.force and index_exists(key):
+        print(f"Index {key} is up to date: {index_path(key)}")
+        return 0
+
+    start = time.perf_counter()
+    vector_db = create_vector_store(iter_documents(args.source))
+    path = save_vector_store(vector_db, key)
+    print(f"Index {key} ({vector_db.index.ntotal} chunks) built in {time.perf_counter() - start:.1f}s: {path}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,24 +1,429 @@
 # core/chatbot.py
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain_openai import ChatOpenAI
 
-def create_chatbot(vector_db):
+from core.answer_cache import AnswerCache, normalize_query
+from core import metrics
+from core.context import build_context, trim_to_sentences
+from core.embeddings import get_facts
+from core.extractive import ANSWER_MODE, ANSWER_MODES, EXTRACTIVE, ExtractiveAnswerer
+from core.intents import IntentRouter
+from core.memory import ConversationMemory
+from core.resilience import DEGRADED, LLM_TIMEOUT, UpstreamError, UpstreamPolicy
+from core.retrieval import HybridRetriever
+from core.singleflight import AsyncSingleFlight, SingleFlight
+
+# Cap on concurrent upstream calls from the async path, per process: this many LLM calls, and
+# separately this many query embeddings, so a quick embedding never queues behind slow answers
+MAX_UPSTREAM_CALLS = int(os.getenv("MAX_UPSTREAM_CALLS", "32"))
+# Concurrent LLM calls while answering one batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Passages quoted, and tokens of each, when the LLM is unavailable
+FALLBACK_PASSAGES = int(os.getenv("FALLBACK_PASSAGES", "2"))
+FALLBACK_TOKENS = int(os.getenv("FALLBACK_TOKENS", "80"))
+
+def passages_answer(docs, passages=FALLBACK_PASSAGES, budget=FALLBACK_TOKENS):
+    # Degraded answer: the opening sentences of the best retrieved passages, with their pages
+    lines = []
+    for doc in docs[:passages]:
+        text = trim_to_sentences(doc.page_content.strip(), budget) or doc.page_content.strip()[:400]
+        source = os.path.basename(str(doc.metadata.get("source", "")))
+        page = f", page {doc.metadata['page'] + 1}" if isinstance(doc.metadata.get("page"), int) else ""
+        lines.append(f"- {' '.join(text.split())} ({source}{page})")
+    if not lines:
+        return "Sorry, I can't answer right now. Please try again in a moment."
+    return "I can't give a full answer right now, but this is what the hospital information says:\n" + "\n".join(lines)
+
+# Create a simple QA chain
+class QAChain:
+    def __init__(self, retriever, llm, cache=None, max_upstream_calls=MAX_UPSTREAM_CALLS, vector_db=None, router=None,
+                 memory=None, policy=None, extractive=None, answer_mode=ANSWER_MODE):
+        self.retriever = retriever
+        self.llm = llm
+        # Deadlines, retries, hedging and the circuit breaker for LLM calls
+        self.policy = policy if policy is not None else UpstreamPolicy()
+        self.extractive = extractive
+        self.answer_mode = answer_mode if answer_mode in ANSWER_MODES else "llm"
+        self.cache = cache
+        self.router = router
+        self.memory = memory
+        self.vector_db = vector_db
+        self.max_upstream_calls = max_upstream_calls
+        self._upstream = None
+        self._embedding = None
+        # Concurrent identical questions share one retrieval + LLM call
+        self.flights = SingleFlight("sync")
+        self.async_flights = AsyncSingleFlight("async")
+
+    def set_vector_store(self, vector_db):
+        # Swap in a rebuilt index; answers cached against the old one are dropped
+        self.retriever = HybridRetriever(vector_db)
+        self.vector_db = vector_db
+        if self.router is not None:
+            self.router.table = get_facts(vector_db)
+        if self.extractive is not None:
+            self.extractive.idf = self.retriever.bm25.idf
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def _fast_path(self, query, question=None):
+        # Structured answer for high-frequency intents (timings, departments, emergency), no LLM.
+        # Not for rewritten follow-ups: "and what about Sunday?" asks about one detail, which
+        # the general fact list for the carried topic doesn't answer.
+        if self.router is None or (question is not None and query != question):
+            return None
+        with metrics.timer("fast_path"):
+            answer = self.router.route(query)
+        metrics.record_cache("intent", answer is not None)
+        if answer is not None:
+            metrics.note("path", "intent")
+        return answer
+
+    def _use_cache(self, mode):
+        # The cache holds LLM answers, which an extractive-mode request must not get
+        return self.cache is not None and not (mode == "extractive" and self.extractive is not None)
+
+    def _cached_exact(self, query, mode):
+        # Answer from the exact tier, which needs no embedding, or None
+        hit = self.cache.exact(query) if self._use_cache(mode) else None
+        if hit is None:
+            return None
+        metrics.record_cache("answer", True)
+        metrics.note("path", "cache")
+        return hit[0]
+
+    def _cached(self, query, mode, vector=None):
+        if not self._use_cache(mode):
+            return None, vector
+        # Keyword queries are retrieved without an embedding, so only the exact tier applies
+        embed = vector is None and not self.retriever.lexical_only(query)
+        with metrics.timer("answer_cache"):
+            answer, vector = self.cache.lookup(query, vector, embed=embed)
+        metrics.record_cache("answer", answer is not None)
+        if answer is not None:
+            metrics.note("path", "cache")
+        return answer, vector
+
+    def _remember(self, query, answer, vector):
+        if self.cache is not None:
+            self.cache.put(query, answer, vector)
+
+    def _turn(self, inputs):
+        # (question as asked, standalone query, history) for this turn. With a session_id,
+        # follow-ups are rewritten for retrieval and caching, and the prompt gets the history.
+        question = inputs.get("query", "")
+        session_id = inputs.get("session_id")
+        if self.memory is None or not session_id:
+            return question, question, ""
+        query = self.memory.rewrite(session_id, question)
+        if query != question:
+            metrics.note("rewritten", query)
+        return question, query, self.memory.history(session_id)
+
+    def _end_turn(self, inputs, question, query, answer):
+        if self.memory is not None and inputs.get("session_id"):
+            self.memory.add(inputs["session_id"], question, answer, standalone=query)
+
+    def _mode(self, inputs):
+        # "mode" in the request, else the chain's default
+        mode = inputs.get("mode") or self.answer_mode
+        return mode if mode in ANSWER_MODES else self.answer_mode
+
+    def _extract(self, query, docs, traces, mode):
+        # Answer without the LLM: always in extractive mode, in auto mode only when the best
+        # passage scored well and one sentence covers the question. None = ask the LLM.
+        if mode == "llm" or self.extractive is None:
+            return None
+        with metrics.timer("extract"):
+            span = self.extractive.best_span(query, docs)
+        if mode == "auto":
+            kept = [entry for entry in (traces[0] if traces else []) if entry["reason"].startswith("kept")]
+            if not self.extractive.confident(span, kept[0] if kept else None):
+                return None
+        EXTRACTIVE.inc(mode=mode)
+        metrics.note("path", "extractive")
+        if span is None:
+            return {"result": "Sorry, I couldn't find that in the hospital information.", "extractive": True}
+        return {"result": self.extractive.format(span), "extractive": True}
+
+    def _prompt(self, query, docs, question=None, history=""):
+        # Deduplicated passages, fitted to the CONTEXT_TOKENS budget
+        with metrics.timer("context"):
+            context = build_context(docs)
+        metrics.note("path", "rag")
+        if history:
+            return f"Conversation so far:\n{history}\n\nContext: {context}\n\nQuestion: {question or query}"
+        return f"Context: {context}\n\nQuestion: {query}"
+
+    def _degraded(self, docs, error):
+        # The LLM gave up (timeout, open circuit, error): answer from the passages instead.
+        # Not cached, so the next asker gets a full answer once upstream recovers.
+        DEGRADED.inc(reason=error.reason)
+        metrics.note("path", "degraded")
+        metrics.note("upstream_error", str(error))
+        return {"result": passages_answer(docs), "degraded": True}
+
+    def _flight_key(self, query, history, mode):
+        # Identical questions without conversation history get identical answers, so they can
+        # share one computation; follow-ups in a conversation can't
+        key = None if history else normalize_query(query)
+        return f"{mode}:{key}" if key else None
+
+    def invoke(self, inputs):
+        question, query, history = self._turn(inputs)
+        mode = self._mode(inputs)
+        result = self._fast_path(query, question)
+        if result is not None:
+            result = {"result": result, "intent": True}
+        else:
+            key = self._flight_key(query, history, mode)
+            if key is None:
+                result = self._invoke(query, question, history, mode)
+            else:
+                result = self.flights.do(key, lambda: self._invoke(query, question, history, mode))
+        self._end_turn(inputs, question, query, result["result"])
+        return result
+
+    def _invoke(self, query, question, history, mode):
+        answer, vector = self._cached(query, mode)
+        if answer is not None:
+            return {"result": answer, "cached": True}
+
+        traces = []
+        with metrics.timer("retrieve"):
+            docs = self.retriever.invoke(query, traces)
+        extracted = self._extract(query, docs, traces, mode)
+        if extracted is not None:
+            return extracted
+        prompt = self._prompt(query, docs, question, history)
+        try:
+            with metrics.timer("llm"):
+                response = self.policy.call(lambda: self.llm.invoke(prompt))
+        except UpstreamError as e:
+            return self._degraded(docs, e)
+        self._remember(query, response.content, vector)
+        return {"result": response.content}
+
+    def stream(self, inputs):
+        # Same as invoke, but yields the answer text piece by piece as the LLM produces it.
+        # A question already being answered waits for that answer and yields it in one piece.
+        question, query, history = self._turn(inputs)
+        mode = self._mode(inputs)
+        answer = self._fast_path(query, question)
+        key = self._flight_key(query, history, mode) if answer is None else None
+        if key is not None:
+            call, leader = self.flights.begin(key)
+            if not leader:
+                answer = self.flights.wait(call)["result"]
+        if answer is not None:
+            self._end_turn(inputs, question, query, answer)
+            yield answer
+            return
+
+        parts = []
+        try:
+            for part in self._stream(query, question, history, mode):
+                parts.append(part)
+                yield part
+        except BaseException as e:
+            if key is not None:
+                # GeneratorExit when the client goes away mid-answer
+                self.flights.finish(key, call, error=e if isinstance(e, Exception) else RuntimeError("Answer stream closed"))
+            raise
+        if key is not None:
+            self.flights.finish(key, call, {"result": "".join(parts)})
+        self._end_turn(inputs, question, query, "".join(parts))
+
+    def _stream(self, query, question, history, mode):
+        answer, vector = self._cached(query, mode)
+        if answer is not None:
+            yield answer
+            return
+
+        traces = []
+        with metrics.timer("retrieve"):
+            docs = self.retriever.invoke(query, traces)
+        extracted = self._extract(query, docs, traces, mode)
+        if extracted is not None:
+            yield extracted["result"]
+            return
+        prompt = self._prompt(query, docs, question, history)
+        parts = []
+        start = time.perf_counter()
+        try:
+            # Failures before the first token fall back to the passages; later ones are raised
+            for chunk in self.policy.stream(lambda: self.llm.stream(prompt)):
+                if chunk.content:
+                    if not parts:
+                        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_first_token")
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except UpstreamError as e:
+            yield self._degraded(docs, e)["result"]
+            return
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm")
+        self._remember(query, "".join(parts), vector)
+
+    async def ainvoke(self, inputs):
+        # Async version of invoke for the ASGI server. Requests beyond the upstream cap
+        # wait here without holding a thread, so one process can keep hundreds waiting.
+        question, query, history = self._turn(inputs)
+        mode = self._mode(inputs)
+        result = self._fast_path(query, question)
+        if result is not None:
+            result = {"result": result, "intent": True}
+        else:
+            key = self._flight_key(query, history, mode)
+            if key is None:
+                result = await self._ainvoke(query, question, history, mode)
+            else:
+                result = await self.async_flights.do(key, lambda: self._ainvoke(query, question, history, mode))
+        self._end_turn(inputs, question, query, result["result"])
+        return result
+
+    async def _ainvoke(self, query, question, history, mode):
+        # Only the embedding and LLM calls hold an upstream slot, so cache hits and extractive
+        # answers never wait behind slow LLM calls. Search, reranking and prompt building are
+        # CPU work and run on threads, off the event loop.
+        if self._upstream is None:
+            self._upstream = asyncio.Semaphore(self.max_upstream_calls)
+            self._embedding = asyncio.Semaphore(self.max_upstream_calls)
+
+        answer = self._cached_exact(query, mode)
+        if answer is not None:
+            return {"result": answer, "cached": True}
+        raw = None
+        if not await asyncio.to_thread(self.retriever.lexical_only, query):
+            async with self._embedding:
+                with metrics.timer("embed"):
+                    raw = await self.retriever.embeddings.aembed_query(query)
+        # Semantic tier, reusing the query vector
+        answer, vector = await asyncio.to_thread(self._cached, query, mode, raw)
+        if answer is not None:
+            return {"result": answer, "cached": True}
+
+        traces = []
+        with metrics.timer("retrieve"):
+            docs = await asyncio.to_thread(self.retriever.retrieve, query, raw, traces)
+        extracted = await asyncio.to_thread(self._extract, query, docs, traces, mode)
+        if extracted is not None:
+            return extracted
+        prompt = await asyncio.to_thread(self._prompt, query, docs, question, history)
+        try:
+            async with self._upstream:
+                with metrics.timer("llm"):
+                    response = await self.policy.acall(lambda: self.llm.ainvoke(prompt))
+        except UpstreamError as e:
+            return self._degraded(docs, e)
+        self._remember(query, response.content, vector)
+        return {"result": response.content}
+
+    def batch(self, inputs_list):
+        # Many questions at once: one embedding request for all queries (keyword queries skip
+        # it), one multi-query FAISS search, then the LLM calls run concurrently. Results keep
+        # the input order; each item is {"result": ...} or {"error": ...}. Batch questions are
+        # standalone, so conversation memory isn't used.
+        queries = [inputs.get("query", "").strip() for inputs in inputs_list]
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            if not query:
+                results[i] = {"error": "Empty message"}
+            elif (answer := self._fast_path(query)) is not None:
+                results[i] = {"result": answer, "intent": True}
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        # Keyword queries are searched with BM25 alone, so only the rest are embedded
+        embedded = [i for i in pending if not self.retriever.lexical_only(queries[i])]
+        raws = {}
+        if embedded:
+            try:
+                with metrics.timer("embed"):
+                    raws = dict(zip(embedded, self.vector_db.embeddings.embed_queries([queries[i] for i in embedded])))
+            except Exception as e:
+                for i in embedded:
+                    results[i] = {"error": str(e)}
+                pending = [i for i in pending if results[i] is None]
+
+        misses = []
+        for i in pending:
+            answer, vector = self._cached(queries[i], self._mode(inputs_list[i]), raws.get(i))
+            if answer is not None:
+                results[i] = {"result": answer, "cached": True}
+            else:
+                misses.append((i, raws.get(i), vector))
+        if not misses:
+            return results
+
+        searched = [(i, raw) for i, raw, _ in misses if raw is not None]
+        retrieved, traces = {}, []
+        with metrics.timer("search"):
+            if searched:
+                found = self.retriever.search_many([queries[i] for i, _ in searched], [raw for _, raw in searched], traces)
+                retrieved = {i: (docs, trace) for (i, _), docs, trace in zip(searched, found, traces)}
+            for i, raw, _ in misses:
+                if raw is None:
+                    trace = []
+                    retrieved[i] = (self.retriever.retrieve(queries[i], None, trace), trace[0])
+        found = [retrieved[i][0] for i, _, _ in misses]
+        traces = [retrieved[i][1] for i, _, _ in misses]
+        remaining = []
+        for (i, raw, vector), docs, trace in zip(misses, found, traces):
+            extracted = self._extract(queries[i], docs, [trace], self._mode(inputs_list[i]))
+            if extracted is not None:
+                results[i] = extracted
+            else:
+                remaining.append(((i, raw, vector), docs))
+        if not remaining:
+            return results
+        misses, found = [m for m, _ in remaining], [docs for _, docs in remaining]
+        prompts = [self._prompt(queries[i], docs) for (i, _, _), docs in zip(misses, found)]
+
+        def answer(prompt):
+            try:
+                return self.policy.call(lambda: self.llm.invoke(prompt))
+            except Exception as e:
+                return e
+
+        with metrics.timer("llm"), ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+            responses = list(pool.map(answer, prompts))
+
+        for (i, _, vector), response, docs in zip(misses, responses, found):
+            if isinstance(response, UpstreamError):
+                results[i] = self._degraded(docs, response)
+            elif isinstance(response, Exception):
+                results[i] = {"error": str(response)}
+            else:
+                self._remember(queries[i], response.content, vector)
+                results[i] = {"result": response.content}
+        return results
+
+def create_chatbot(vector_db, llm=None):
     # LLM setup
-    llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
-    retriever = vector_db.as_retriever()
-    
-    # Create a simple QA chain
-    class QAChain:
-        def __init__(self, retriever, llm):
-            self.retriever = retriever
-            self.llm = llm
-        
-        def invoke(self, inputs):
-            query = inputs.get("query", "")
-            docs = self.retriever.invoke(query)
-            context = "\n".join([doc.page_content for doc in docs])
-            
-            response = self.llm.invoke(f"Context: {context}\n\nQuestion: {query}")
-            return {"result": response.content}
-    
-    qa_chain = QAChain(retriever, llm)
+    if llm is None:
+        # Retries are done by the UpstreamPolicy, so the client only enforces the timeout
+        llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo", timeout=LLM_TIMEOUT, max_retries=0)
+    # BM25 + vector search fused with reciprocal rank fusion
+    retriever = HybridRetriever(vector_db)
+    # Repeat questions (exact or near-duplicate wording) are answered from memory
+    cache = AnswerCache(embed=vector_db.embeddings.embed_query)
+
+    # Confident matches for frequent intents are answered from the fact table built at ingestion
+    router = IntentRouter(get_facts(vector_db))
+
+    # Per-session history, so follow-up questions make sense
+    memory = ConversationMemory()
+
+    # Questions answered by one sentence of the PDF (a phone number, a timing) skip the LLM
+    extractive = ExtractiveAnswerer(retriever.bm25.idf)
+
+    qa_chain = QAChain(retriever, llm, cache, vector_db=vector_db, router=router, memory=memory,
+                       extractive=extractive)
     return qa_chain
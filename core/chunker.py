@@ -0,0 +1,132 @@
+# core/chunker.py
+import logging
+import os
+import re
+
+import tiktoken
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Chunk sizes are in tokens of the embedding/chat models' tokenizer. tiktoken downloads its BPE
+# file on first use; offline, point TIKTOKEN_CACHE_DIR at a copy, or set TOKEN_ENCODING=approx.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "300"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+# Sentence breaks, except after titles and abbreviations such as "Dr." or "Rs."
+SENTENCE_END = re.compile(r"(?<!\bDr\.)(?<!\bMr\.)(?<!\bMs\.)(?<!\bRs\.)(?<!\bNo\.)(?<!\bSt\.)(?<!\bMrs\.)(?<!\bProf\.)(?<=[.!?])\s+")
+# Short lines like "CARDIOLOGY DEPARTMENT", "3. OPD Timings" or "Contact Numbers:" open a section
+HEADING = re.compile(r"^(?:\d+(?:\.\d+)*[.)]?\s+)?[A-Z][A-Za-z0-9&/(),' -]{2,70}:?$")
+
+_encoding = None
+
+class ApproxEncoding:
+    # One token per word or punctuation mark, close to cl100k_base for English text. Used with
+    # TOKEN_ENCODING=approx, or when tiktoken's BPE file can't be loaded.
+    name = "approx"
+    pattern = re.compile(r"\w+|[^\w\s]")
+
+    def encode(self, text, disallowed_special=()):
+        return self.pattern.findall(text)
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        if TOKEN_ENCODING == ApproxEncoding.name:
+            _encoding = ApproxEncoding()
+        else:
+            try:
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except ValueError:
+                raise
+            except Exception as e:
+                # No network and no cached BPE file: keep working with approximate counts
+                logger.warning("Couldn't load the %s tokenizer (%s); counting tokens approximately. "
+                               "Set TIKTOKEN_CACHE_DIR to a directory with its BPE file to use it offline.",
+                               TOKEN_ENCODING, e)
+                _encoding = ApproxEncoding()
+    return _encoding
+
+def count_tokens(text):
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+def chunk_settings():
+    # The encoding actually in use: approximate chunks must not share an index with tiktoken ones
+    return {"chunk_tokens": CHUNK_TOKENS, "chunk_overlap": CHUNK_OVERLAP, "encoding": get_encoding().name}
+
+def is_heading(line):
+    if not HEADING.match(line) or line.endswith("."):
+        return False
+    words = line.rstrip(":").split()
+    # Title Case / UPPER CASE lines of a few words, not the start of a wrapped sentence
+    return len(words) <= 8 and (line.isupper() or line.endswith(":") or all(w[0].isupper() or not w[0].isalpha() for w in words))
+
+def _units(text):
+    # Lines, then sentences within a line, so chunks break at natural boundaries
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if is_heading(line):
+            yield line, True
+            continue
+        for sentence in SENTENCE_END.split(line):
+            if sentence:
+                yield sentence, False
+
+def sentences(text):
+    return [unit for unit, _ in _units(text)]
+
+def _hard_split(unit, size):
+    # A single sentence longer than a chunk is cut on token boundaries
+    encoding = get_encoding()
+    tokens = encoding.encode(unit, disallowed_special=())
+    for i in range(0, len(tokens), size):
+        piece = encoding.decode(tokens[i:i + size]).strip()
+        yield piece, len(tokens[i:i + size])
+
+def split_pages(pages, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    # Lazily turns a stream of page Documents into overlapping token-bounded chunks.
+    # Only the current page is held in memory; the section heading carries over page breaks.
+    overlap = min(overlap, chunk_tokens // 2)
+    section = ""
+    for page in pages:
+        current, size, index = [], 0, 0
+        chunk_section = section
+
+        def emit():
+            nonlocal index
+            metadata = dict(page.metadata, section=chunk_section, chunk=index)
+            index += 1
+            return Document(page_content="\n".join(text for text, _ in current), metadata=metadata)
+
+        for unit, heading in _units(page.page_content):
+            if heading:
+                # Start a fresh chunk at a new section instead of overlapping across it
+                if current:
+                    yield emit()
+                    current, size = [], 0
+                section = chunk_section = unit.rstrip(":")
+            pieces = _hard_split(unit, chunk_tokens) if count_tokens(unit) > chunk_tokens else [(unit, count_tokens(unit))]
+            for text, tokens in pieces:
+                if current and size + tokens > chunk_tokens:
+                    yield emit()
+                    # Carry the tail of the previous chunk forward as overlap
+                    kept, kept_size = [], 0
+                    for prev in reversed(current):
+                        if kept_size + prev[1] > overlap:
+                            break
+                        kept.insert(0, prev)
+                        kept_size += prev[1]
+                    if kept_size + tokens > chunk_tokens:
+                        kept, kept_size = [], 0
+                    current, size = kept, kept_size
+                    chunk_section = section
+                current.append((text, tokens))
+                size += tokens
+        if current:
+            yield emit()
@@ -0,0 +1,72 @@
+# core/context.py
+import logging
+import os
+
+from core import metrics
+from core.bm25 import tokenize
+from core.chunker import count_tokens, sentences
+
+logger = logging.getLogger(__name__)
+
+# Max tokens of retrieved text sent to the LLM per question
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1500"))
+# Passages sharing at least this fraction of word trigrams with a kept passage are dropped
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+def _shingles(text, n=3):
+    words = tokenize(text)
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def is_near_duplicate(shingles, others, threshold=CONTEXT_DEDUP_THRESHOLD):
+    # Containment rather than Jaccard, so a passage inside a longer kept one also counts
+    for other in others:
+        if len(shingles & other) / max(1, min(len(shingles), len(other))) >= threshold:
+            return True
+    return False
+
+def trim_to_sentences(text, budget):
+    # Longest prefix of whole sentences that fits the budget
+    kept, used = [], 0
+    for sentence in sentences(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    return "\n".join(kept)
+
+def build_context(docs, budget=CONTEXT_TOKENS):
+    # docs are best first. Near-duplicates are skipped, passages are added until the budget
+    # is reached and the last one is cut at a sentence boundary.
+    passages, seen = [], []
+    used = raw = duplicates = 0
+    for doc in docs:
+        text = doc.page_content.strip()
+        tokens = count_tokens(text)
+        raw += tokens
+        if used >= budget:
+            continue
+        shingles = _shingles(text)
+        if is_near_duplicate(shingles, seen):
+            duplicates += 1
+            continue
+        if used + tokens > budget:
+            text = trim_to_sentences(text, budget - used)
+            if not text:
+                continue
+            tokens = count_tokens(text)
+        seen.append(shingles)
+        passages.append(text)
+        used += tokens
+
+    logger.info(
+        "Context: %d/%d passages, %d duplicates, %d tokens (saved %d of %d)",
+        len(passages), len(docs), duplicates, used, raw - used, raw,
+    )
+    metrics.CONTEXT_TOKENS.observe(used)
+    metrics.CONTEXT_TOKENS_SAVED.inc(raw - used)
+    metrics.note("context_tokens", used)
+    metrics.note("context_tokens_saved", raw - used)
+    return "\n\n".join(passages)
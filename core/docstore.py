@@ -0,0 +1,93 @@
+# core/docstore.py
+# Read-only docstore in flat files that every server worker maps instead of unpickling its own copy:
+#   docs.bin          JSON records (page_content + metadata), one after another, in FAISS row order
+#   docs.offsets.npy  int64 start of each record, plus the end of the last
+#   docs.ids.npy      docstore id of each FAISS row
+#   docs.sorted_ids.npy / docs.sorted_rows.npy   ids in sorted order and their rows, for binary search
+import json
+import mmap
+import os
+from collections.abc import Mapping
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+FILES = ("docs.bin", "docs.offsets.npy", "docs.ids.npy", "docs.sorted_ids.npy", "docs.sorted_rows.npy")
+
+def write_docstore(folder, vector_db):
+    n = len(vector_db.index_to_docstore_id)
+    ids = [vector_db.index_to_docstore_id[i] for i in range(n)]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    with open(os.path.join(folder, "docs.bin"), "wb") as f:
+        for row, doc_id in enumerate(ids):
+            doc = vector_db.docstore.search(doc_id)
+            record = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, default=str)
+            f.write(record.encode("utf-8"))
+            offsets[row + 1] = f.tell()
+    width = max([len(doc_id.encode("utf-8")) for doc_id in ids] or [1])
+    id_array = np.array([doc_id.encode("utf-8") for doc_id in ids], dtype=f"S{width}")
+    order = np.argsort(id_array, kind="stable")
+    np.save(os.path.join(folder, "docs.offsets.npy"), offsets)
+    np.save(os.path.join(folder, "docs.ids.npy"), id_array)
+    np.save(os.path.join(folder, "docs.sorted_ids.npy"), id_array[order])
+    np.save(os.path.join(folder, "docs.sorted_rows.npy"), order.astype(np.int64))
+
+def has_docstore(folder):
+    return all(os.path.exists(os.path.join(folder, name)) for name in FILES)
+
+class RowIds(Mapping):
+    # index_to_docstore_id backed by the mapped ids array: FAISS row -> docstore id
+    def __init__(self, ids):
+        self._ids = ids
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self._ids):
+            raise KeyError(row)
+        return self._ids[row].decode("utf-8")
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(range(len(self._ids)))
+
+class MmapDocstore(Docstore):
+    # Pages are shared through the OS page cache, so N workers hold one physical copy.
+    # Documents are decoded on every lookup; that's a few microseconds for a chunk.
+    def __init__(self, folder):
+        self._file = open(os.path.join(folder, "docs.bin"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = np.load(os.path.join(folder, "docs.offsets.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(folder, "docs.ids.npy"), mmap_mode="r")
+        self._sorted_ids = np.load(os.path.join(folder, "docs.sorted_ids.npy"), mmap_mode="r")
+        self._sorted_rows = np.load(os.path.join(folder, "docs.sorted_rows.npy"), mmap_mode="r")
+
+    def row(self, doc_id):
+        key = doc_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._sorted_rows[i])
+        return None
+
+    def document(self, row):
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        record = json.loads(self._data[start:end])
+        return Document(id=self.ids[row].decode("utf-8"), page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, search):
+        # Same contract as InMemoryDocstore: a Document, or a message string if missing
+        row = self.row(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.document(row)
+
+    def add(self, texts):
+        raise NotImplementedError("MmapDocstore is read-only; rebuild the index to change it")
+
+    def delete(self, ids):
+        raise NotImplementedError("MmapDocstore is read-only; rebuild the index to change it")
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,170 @@
+# core/embedding_backends.py
+# Embedding providers, picked with EMBEDDING_BACKEND. Each is a langchain Embeddings
+# (embed_documents for batches, embed_query for one text):
+#   openai  - OpenAI API (EMBEDDING_MODEL), one network round-trip per query
+#   hashing - NumPy feature-hashing vectorizer, in-process, no model files, no network
+#   onnx    - small sentence model (e.g. all-MiniLM-L6-v2 exported to ONNX) run on CPU from disk
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from core.bm25 import tokenize
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_BACKENDS = ("openai", "hashing", "onnx")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+HASHING_DIM = int(os.getenv("HASHING_DIM", "768"))
+# Folder with model.onnx and tokenizer.json
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "models", "minilm"))
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+ONNX_MAX_LENGTH = int(os.getenv("ONNX_MAX_LENGTH", "256"))
+
+class HashingEmbeddings(Embeddings):
+    # Signed feature hashing of words, word pairs and character trigrams with sublinear term
+    # frequency, L2-normalized. Character trigrams let "cardiac"/"cardiology" or typos overlap.
+    # No IDF: that would need corpus statistics saved with (and invalidated by) every index.
+    WEIGHTS = {"word": 1.0, "pair": 0.7, "trigram": 0.3}
+
+    def __init__(self, size=HASHING_DIM, max_cached=200_000):
+        self.size = size
+        self.model = f"hashing-{size}-v1"
+        # word or word pair -> (columns, signed weights); the vocabulary of one corpus is small
+        self._cache = {}
+        self.max_cached = max_cached
+
+    def _hash(self, features):
+        columns, signs = [], []
+        for feature in features:
+            h = zlib.crc32(feature.encode())
+            columns.append(h % self.size)
+            signs.append(1.0 if h & 0x80000000 else -1.0)
+        return np.array(columns, dtype=np.int64), np.array(signs, dtype=np.float32)
+
+    def _cached(self, key, build):
+        entry = self._cache.get(key)
+        if entry is None:
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            entry = self._cache[key] = build()
+        return entry
+
+    def _word(self, word):
+        def build():
+            padded = f"<{word}>"
+            trigrams = ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+            columns, signs = self._hash(["w:" + word] + trigrams)
+            signs[0] *= self.WEIGHTS["word"]
+            signs[1:] *= self.WEIGHTS["trigram"]
+            return columns, signs
+        return self._cached(word, build)
+
+    def _pair(self, pair):
+        def build():
+            columns, signs = self._hash([f"p:{pair[0]} {pair[1]}"])
+            return columns, signs * self.WEIGHTS["pair"]
+        return self._cached(pair, build)
+
+    def _embed_many(self, texts):
+        vectors = np.zeros((len(texts), self.size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            parts = [(self._word(word), n) for word, n in Counter(words).items()]
+            parts += [(self._pair(pair), n) for pair, n in Counter(zip(words, words[1:])).items()]
+            if parts:
+                columns = np.concatenate([columns for (columns, _), _ in parts])
+                values = np.concatenate([signs * n for (_, signs), n in parts])
+                vectors[row] = np.bincount(columns, weights=values, minlength=self.size)
+        # Sublinear tf: a word repeated ten times shouldn't count ten times as much
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_documents(self, texts):
+        return self._embed_many(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._embed_many([text])[0].tolist()
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
+
+def onnx_model_name(model_dir, max_length):
+    # Different model files must never share cached vectors or indexes
+    model_path = os.path.join(model_dir, "model.onnx")
+    size = os.path.getsize(model_path) if os.path.exists(model_path) else 0
+    return f"onnx:{os.path.basename(os.path.normpath(model_dir))}:{size}:{max_length}"
+
+class OnnxEmbeddings(Embeddings):
+    # Mean-pooled, L2-normalized sentence embeddings from an ONNX transformer on CPU
+    def __init__(self, model_dir=ONNX_MODEL_DIR, batch_size=ONNX_BATCH_SIZE, max_length=ONNX_MAX_LENGTH):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx needs: pip install onnxruntime tokenizers") from e
+        model_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No ONNX model at {model_path} (set ONNX_MODEL_DIR)")
+
+        self.batch_size = max(1, batch_size)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model = onnx_model_name(model_dir, max_length)
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+        if hidden.ndim == 3:
+            weights = mask[..., None].astype(np.float32)
+            hidden = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(hidden, axis=1, keepdims=True)
+        return hidden / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        # Batch texts of similar length together so little time is spent on padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+def create_embeddings(backend=EMBEDDING_BACKEND):
+    # Returns (embeddings, model name); the model name keys the embedding cache and the index
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL
+    if backend == "hashing":
+        embeddings = HashingEmbeddings()
+        return embeddings, embeddings.model
+    if backend == "onnx":
+        embeddings = OnnxEmbeddings()
+        return embeddings, embeddings.model
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+def embedding_model_name(backend=EMBEDDING_BACKEND):
+    # Same name create_embeddings() returns, without loading a model
+    if backend == "hashing":
+        return HashingEmbeddings().model
+    if backend == "onnx":
+        return onnx_model_name(ONNX_MODEL_DIR, ONNX_MAX_LENGTH)
+    return EMBEDDING_MODEL
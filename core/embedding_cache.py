@@ -0,0 +1,132 @@
+# core/embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Settings for talking to the embedding provider
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+
+def text_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    # On-disk map of sha256(model + text) -> float32 vector
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items):
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddings(Embeddings):
+    # Wraps a provider so only texts missing from the store are sent, in batches over a thread pool
+    def __init__(self, embeddings, store, model, batch_size=EMBED_BATCH_SIZE, max_workers=EMBED_WORKERS):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.stats = {"hits": 0, "misses": 0, "embedded": 0, "embedded_seconds": 0.0}
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [text_key(self.model, text) for text in texts]
+        found = self.store.get_many(list(set(keys)))
+
+        # Deduplicate misses so repeated chunks are only paid for once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+
+        if missing:
+            start = time.perf_counter()
+            items = list(missing.items())
+            batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+            workers = min(self.max_workers, len(batches))
+            if workers == 1:
+                results = map(self._embed_batch, batches)
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers)
+                results = pool.map(self._embed_batch, batches)
+            try:
+                for batch, vectors in zip(batches, results):
+                    fresh = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+                    self.store.put_many(fresh)
+                    found.update(fresh)
+            finally:
+                if workers > 1:
+                    pool.shutdown()
+            elapsed = time.perf_counter() - start
+            self.stats["embedded"] += len(missing)
+            self.stats["embedded_seconds"] += elapsed
+            logger.info(
+                "Embedded %d new chunks in %.2fs (%.1f chunks/s, %d batches, %d workers)",
+                len(missing), elapsed, len(missing) / elapsed if elapsed else 0.0, len(batches), workers,
+            )
+
+        self.stats["hits"] += hits
+        self.stats["misses"] += len(texts) - hits
+        metrics.record_cache("embedding", True, hits)
+        metrics.record_cache("embedding", False, len(texts) - hits)
+        logger.debug("Embedding cache: %d hits, %d misses", hits, len(texts) - hits)
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text):
+        # Questions go straight to the provider: they rarely repeat, and storing each one would
+        # grow the store and take its lock on every request
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        # Many questions in one provider request, also kept out of the store
+        return self.embeddings.embed_documents(list(texts))
+
+    def _embed_batch(self, batch):
+        with metrics.timer("embed_provider"):
+            return self.embeddings.embed_documents([text for _, text in batch])
+
+    def summary(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["embedded"] / self.stats["embedded_seconds"] if self.stats["embedded_seconds"] else 0.0
+        return (
+            f"embedding cache: {self.stats['hits']}/{total} hits, {self.stats['embedded']} embedded"
+            f" in {self.stats['embedded_seconds']:.1f}s ({rate:.1f} chunks/s)"
+        )
@@ -1,9 +1,291 @@
 # core/embeddings.py
-from langchain_openai import OpenAIEmbeddings
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 
-def create_vector_store(documents):
-    # OpenAI embeddings ke sath FAISS vector store
-    embeddings = OpenAIEmbeddings()
-    vector_db = FAISS.from_documents(documents, embeddings)
+from core import metrics
+from core.bm25 import BM25Index, MappedBM25Index, has_bm25, write_bm25
+from core.chunker import chunk_settings, split_pages
+from core.docstore import MmapDocstore, RowIds, has_docstore, write_docstore
+from core.embedding_backends import EMBEDDING_BACKEND, create_embeddings, embedding_model_name
+from core.intents import FactTable
+from core.embedding_cache import EMBED_BATCH_SIZE, EMBED_WORKERS, CachedEmbeddings, EmbeddingStore
+from core.pdf_loader import DEFAULT_SOURCE, content_key, find_pdfs, iter_documents
+
+logger = logging.getLogger(__name__)
+
+# Built indexes are saved here, one folder per index key
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "index"))
+# Per-chunk vectors shared by every index build, so a one-page change only re-embeds that page
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", os.path.join(INDEX_DIR, "embeddings.sqlite"))
+# Chunks are embedded and added to the index this many at a time (enough to keep every embed worker busy)
+INGEST_BATCH = int(os.getenv("INGEST_BATCH", str(EMBED_BATCH_SIZE * EMBED_WORKERS)))
+
+_embedding_store = None
+
+# FAISS index type: flat (exact), hnsw, ivf or ivfpq. Build-time parameters are part of the
+# index key; nprobe / efSearch are query-time and applied on load.
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))  # 0 = about 4 * sqrt(number of chunks)
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "16"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "8"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+# Map saved indexes read-only instead of reading them into memory, so server workers on one
+# machine share a single copy of the vectors and documents through the page cache
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+
+def get_embeddings(backend=EMBEDDING_BACKEND):
+    global _embedding_store
+    embeddings, model = create_embeddings(backend)
+    if backend == "hashing":
+        # Hashing a chunk is cheaper than looking its vector up in SQLite
+        return embeddings
+    if _embedding_store is None:
+        _embedding_store = EmbeddingStore(EMBEDDING_CACHE)
+    return CachedEmbeddings(embeddings, _embedding_store, model)
+
+def index_settings():
+    # Everything besides the PDF bytes that changes what ends up in the index
+    index = {"type": INDEX_TYPE}
+    if INDEX_TYPE == "hnsw":
+        index["hnsw_m"] = INDEX_HNSW_M
+    elif INDEX_TYPE in ("ivf", "ivfpq"):
+        index["nlist"] = INDEX_NLIST
+        if INDEX_TYPE == "ivfpq":
+            index["pq_m"] = INDEX_PQ_M
+    return {"embedding_model": embedding_model_name(), "chunking": chunk_settings(), "index": index}
+
+def index_key(source=DEFAULT_SOURCE):
+    # Content-addressed: same PDF(s) + same settings -> same key. Each PDF's sha256 comes from
+    # content_key, which only re-reads a file whose size or mtime changed, so starting a server
+    # (or another worker) doesn't read the whole corpus
+    digest = hashlib.sha256()
+    if os.path.isdir(source):
+        paths = [(os.path.relpath(path, source), path) for path in find_pdfs(source)]
+    else:
+        paths = [("", source)]
+    for name, path in paths:
+        digest.update(name.encode() + b"\0" + content_key(path).encode() + b"\0")
+    digest.update(json.dumps(index_settings(), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def index_path(key):
+    return os.path.join(INDEX_DIR, key)
+
+def build_ann_index(vectors, index_type=INDEX_TYPE, nlist=INDEX_NLIST, pq_m=INDEX_PQ_M, hnsw_m=INDEX_HNSW_M):
+    # Builds a FAISS index of the given type over an (n, d) float32 array
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    if index_type in ("ivf", "ivfpq"):
+        # k-means wants ~39+ training points per list (and 256 per PQ codebook)
+        wanted = nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(wanted, n // 39))
+        if nlist < wanted:
+            logger.warning("Only %d vectors; using nlist=%d instead of %d", n, nlist, wanted)
+        if index_type == "ivfpq" and n < 256:
+            logger.warning("%d vectors are too few to train PQ codebooks; using ivf", n)
+            index_type = "ivf"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+    else:
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            if d % pq_m:
+                raise ValueError(f"INDEX_PQ_M={pq_m} must divide the embedding size {d}")
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, 8)
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def set_search_params(index, nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH):
+    # Query-time recall/latency knobs; no-op for flat indexes
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    else:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    return index
+
+def create_vector_store(pages, embeddings=None):
+    # OpenAI embeddings ke sath FAISS vector store.
+    # Pages may be a lazy stream; they are chunked and indexed batch by batch.
+    # A BM25 index and the intent fact table are built from the same chunks alongside.
+    if embeddings is None:
+        embeddings = get_embeddings()
+    start = time.perf_counter()
+    page_count = 0
+
+    def counted(pages):
+        nonlocal page_count
+        for page in pages:
+            page_count += 1
+            yield page
+
+    chunks = split_pages(counted(pages))
+    bm25 = BM25Index()
+    facts = FactTable()
+    vector_db = None
+    while True:
+        # Parsing and chunking happen lazily while the next batch is pulled
+        with metrics.timer("ingest_parse_chunk"):
+            batch = list(islice(chunks, INGEST_BATCH))
+        if not batch:
+            break
+        ids = [str(uuid.uuid4()) for _ in batch]
+        with metrics.timer("ingest_embed_index"):
+            if vector_db is None:
+                vector_db = FAISS.from_documents(batch, embeddings, ids=ids)
+            else:
+                vector_db.add_documents(batch, ids=ids)
+        with metrics.timer("ingest_lexical"):
+            for doc_id, doc in zip(ids, batch):
+                bm25.add(doc_id, doc.page_content)
+                facts.add(doc)
+    if vector_db is None:
+        raise ValueError("No text found to index")
+    vector_db.bm25 = bm25
+    vector_db.facts = facts
+    if INDEX_TYPE != "flat":
+        # Chunks were indexed flat while streaming; rebuild the same vectors as the ANN index
+        with metrics.timer("ingest_ann"):
+            vectors = vector_db.index.reconstruct_n(0, vector_db.index.ntotal)
+            vector_db.index = set_search_params(build_ann_index(vectors))
+    elapsed = time.perf_counter() - start
+    chunk_count = vector_db.index.ntotal
+    metrics.INGESTED.inc(page_count, kind="pages")
+    metrics.INGESTED.inc(chunk_count, kind="chunks")
+    logger.info(
+        "Indexed %d pages, %d chunks in %.1fs (%.1f pages/s, %.1f chunks/s)",
+        page_count, chunk_count, elapsed, page_count / elapsed, chunk_count / elapsed,
+    )
+    if isinstance(embeddings, CachedEmbeddings):
+        logger.info(embeddings.summary())
+    return vector_db
+
+def search_ids_by_vectors(vector_db, vectors, k=4):
+    # One FAISS search for many query vectors; returns [(docstore id, distance)] per query
+    distances, ids = vector_db.index.search(np.asarray(vectors, dtype=np.float32), k)
+    results = []
+    for row, row_distances in zip(ids, distances):
+        results.append([
+            (vector_db.index_to_docstore_id[i], float(distance))
+            for i, distance in zip(row, row_distances) if i != -1
+        ])
+    return results
+
+def save_vector_store(vector_db, key):
+    # Write into a temp folder first so a crashed build never leaves a half-written index behind
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=INDEX_DIR)
+    try:
+        vector_db.save_local(tmp_dir)
+        write_docstore(tmp_dir, vector_db)
+        with open(os.path.join(tmp_dir, "bm25.pkl"), "wb") as f:
+            pickle.dump(get_bm25(vector_db), f, protocol=pickle.HIGHEST_PROTOCOL)
+        write_bm25(tmp_dir, get_bm25(vector_db))
+        with open(os.path.join(tmp_dir, "facts.json"), "w") as f:
+            json.dump(get_facts(vector_db).facts, f, indent=2)
+        with open(os.path.join(tmp_dir, "settings.json"), "w") as f:
+            json.dump(index_settings(), f, indent=2, sort_keys=True)
+        target = index_path(key)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(tmp_dir, target)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return index_path(key)
+
+@contextmanager
+def build_lock(key):
+    # One builder per index: workers starting together wait for it and then load its result
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(os.path.join(INDEX_DIR, f".{key}.lock"), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def index_exists(key):
+    return os.path.exists(os.path.join(index_path(key), "index.faiss"))
+
+def load_vector_store(key):
+    if not index_exists(key):
+        return None
+    folder = index_path(key)
+    if INDEX_MMAP and has_docstore(folder):
+        vector_db = map_vector_store(folder)
+    else:
+        # The pickle docstore and BM25 index are written by save_vector_store, so they are trusted
+        vector_db = FAISS.load_local(folder, get_embeddings(), allow_dangerous_deserialization=True)
+    set_search_params(vector_db.index)
+    bm25_path = os.path.join(index_path(key), "bm25.pkl")
+    if INDEX_MMAP and has_bm25(folder):
+        vector_db.bm25 = MappedBM25Index(folder)
+    elif os.path.exists(bm25_path):
+        with open(bm25_path, "rb") as f:
+            vector_db.bm25 = pickle.load(f)
+    facts_path = os.path.join(index_path(key), "facts.json")
+    if os.path.exists(facts_path):
+        with open(facts_path) as f:
+            vector_db.facts = FactTable(json.load(f))
+    return vector_db
+
+def map_vector_store(folder):
+    # Vectors (IO_FLAG_MMAP_IFC: flat, HNSW and IVF storage; older faiss only maps IVF lists)
+    # and documents stay in the page cache, shared by every process that maps them
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index(os.path.join(folder, "index.faiss"), flags)
+    docstore = MmapDocstore(folder)
+    return FAISS(get_embeddings(), index, docstore, RowIds(docstore.ids))
+
+def get_bm25(vector_db):
+    if getattr(vector_db, "bm25", None) is None:
+        vector_db.bm25 = BM25Index.from_vector_store(vector_db)
+    return vector_db.bm25
+
+def get_facts(vector_db):
+    if getattr(vector_db, "facts", None) is None:
+        vector_db.facts = FactTable.from_vector_store(vector_db)
+    return vector_db.facts
+
+def get_vector_store(source=DEFAULT_SOURCE):
+    # Load the cached index for this PDF (or directory of PDFs), building and saving it only on a miss
+    key = index_key(source)
+    vector_db = load_vector_store(key)
+    if vector_db is None:
+        with build_lock(key):
+            # Another worker may have built it while this one waited for the lock
+            vector_db = load_vector_store(key)
+            if vector_db is None:
+                save_vector_store(create_vector_store(iter_documents(source)), key)
+                vector_db = load_vector_store(key)
+    vector_db.index_key = key
     return vector_db
@@ -0,0 +1,36 @@
+# core/explain.py
+# Shows what retrieval does with a question:  python -m core.explain "OPD timings on Sunday?" [--json]
+# Lists every reranked candidate with its vector similarity, query-term coverage, final score and
+# the reason it was kept or cut (below_min_score, below_relative_cutoff, redundant, max_k).
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+from core.embeddings import get_vector_store
+from core.pdf_loader import DEFAULT_SOURCE
+from core.retrieval import HybridRetriever
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Explain retrieval cutoffs for a question.")
+    parser.add_argument("question")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="PDF file or directory the index was built from")
+    parser.add_argument("--json", action="store_true", help="print the trace as JSON")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    retriever = HybridRetriever(get_vector_store(args.source))
+    trace = retriever.explain(args.question)
+    if args.json:
+        print(json.dumps(trace, indent=2))
+        return 0
+    print(f"{'reason':<22} {'score':>6} {'sim':>6} {'lex':>6} {'overlap':>7}  source")
+    for entry in trace:
+        similarity = "-" if entry["similarity"] is None else f"{entry['similarity']:.3f}"
+        page = f" p{entry['page'] + 1}" if isinstance(entry["page"], int) else ""
+        print(f"{entry['reason']:<22} {entry['score']:>6.3f} {similarity:>6} {entry['lexical']:>6.3f} "
+              f"{entry['overlap']:>7.3f}  {entry['source']}{page}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
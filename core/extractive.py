@@ -0,0 +1,101 @@
+# core/extractive.py
+# LLM-free answers: picks the sentence in the retrieved passages that best answers the question
+# (a phone number, a timing, a fee) and returns it with its page reference, in about a millisecond.
+import os
+import re
+
+from core import metrics
+from core.bm25 import tokenize
+from core.chunker import is_heading, sentences
+from core.intents import PHONE, TIME
+from core.rerank import content_terms, coverage
+
+# llm: always ask the LLM. extractive: always answer with a span. auto: a span when retrieval
+# and the span are both confident, else the LLM. Requests can override with "mode"; auto is
+# opt-in so existing clients keep getting LLM answers.
+ANSWER_MODES = ("llm", "extractive", "auto")
+ANSWER_MODE = os.getenv("ANSWER_MODE", "llm")
+# auto mode: rerank score of the best passage, and IDF-weighted share of the question's words
+# the span must cover
+EXTRACTIVE_MIN_SCORE = float(os.getenv("EXTRACTIVE_MIN_SCORE", "0.5"))
+EXTRACTIVE_MIN_COVERAGE = float(os.getenv("EXTRACTIVE_MIN_COVERAGE", "0.75"))
+# Longer spans read like passages, not answers; auto mode leaves them to the LLM
+EXTRACTIVE_MAX_WORDS = int(os.getenv("EXTRACTIVE_MAX_WORDS", "60"))
+
+EXTRACTIVE = metrics.Counter("chatbot_extractive_total", "Answers given from a retrieved sentence without the LLM", ["mode"])
+
+EXTENSION = re.compile(r"\b(?:ext(?:ension)?\.?|x)\s*\d{2,5}\b", re.I)
+
+# Questions asking for a number or a time prefer sentences that contain one
+ANSWER_TYPES = (
+    ({"phone", "number", "numbers", "contact", "call", "helpline", "landline", "mobile"}, PHONE),
+    ({"extension", "ext"}, EXTENSION),
+    ({"timing", "timings", "time", "times", "hours", "open", "opens", "close", "closes", "schedule"}, TIME),
+)
+ANSWER_TYPE_BONUS = 0.25
+# Later passages ranked lower, so their sentences need a slightly better match
+RANK_PENALTY = 0.02
+# Words found only in the section heading count for this much
+HEADING_WEIGHT = 0.5
+# Two adjacent sentences ("Dr. Sara Ali is a neurologist." "Consultation fee is Rs. 2500.") are a
+# candidate too, scored up to this much lower than one sentence that says the same. The second
+# sentence usually continues the first, so the less the first matches, the bigger the penalty.
+PAIR_PENALTY = 0.1
+
+class ExtractiveAnswerer:
+    def __init__(self, idf, min_score=EXTRACTIVE_MIN_SCORE, min_coverage=EXTRACTIVE_MIN_COVERAGE,
+                 max_words=EXTRACTIVE_MAX_WORDS):
+        self.idf = idf
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self.max_words = max_words
+
+    def best_span(self, query, docs):
+        # {"text", "source", "page", "coverage", "typed", "score"} for the best sentence or pair, or None
+        query_terms = content_terms(query)
+        if not query_terms:
+            return None
+        words = set(tokenize(query))
+        wanted = [pattern for keywords, pattern in ANSWER_TYPES if keywords & words]
+        best = None
+        for rank, doc in enumerate(docs):
+            heading, heading_terms, previous = "", set(), None
+            for sentence in sentences(doc.page_content):
+                if is_heading(sentence):
+                    heading, heading_terms, previous = sentence.rstrip(":"), content_terms(sentence), None
+                    continue
+                terms = content_terms(sentence)
+                candidates = [(sentence, terms, 0.0)]
+                if previous is not None:
+                    lead = coverage(self.idf, query_terms, previous[1])
+                    candidates.append((f"{previous[0]} {sentence}", previous[1] | terms, PAIR_PENALTY * (1 - lead)))
+                previous = (sentence, terms)
+                for text, span_terms, penalty in candidates:
+                    span = self._score(query_terms, wanted, text, span_terms, heading, heading_terms, penalty + RANK_PENALTY * rank)
+                    if best is None or span["score"] > best["score"]:
+                        best = dict(span, source=os.path.basename(str(doc.metadata.get("source", ""))),
+                                    page=doc.metadata.get("page"))
+        return best
+
+    def _score(self, query_terms, wanted, text, terms, heading, heading_terms, penalty):
+        own = coverage(self.idf, query_terms, terms)
+        # "OPD Timings:" followed by "Monday to Saturday, 8 AM to 2 PM."
+        covered = coverage(self.idf, query_terms, terms | heading_terms)
+        typed = any(pattern.search(text) for pattern in wanted)
+        score = own + HEADING_WEIGHT * (covered - own) + (ANSWER_TYPE_BONUS if typed else 0.0) - penalty
+        return {"text": f"{heading}: {text}" if covered > own else text,
+                "coverage": round(covered, 4), "typed": typed or not wanted, "score": round(score, 4)}
+
+    def confident(self, span, best):
+        # auto mode answers with the span only when all of these hold. best is the top kept
+        # rerank trace entry; it needs a vector similarity, since a keyword query's BM25-only
+        # score is just term coverage and one common word is enough to pass it.
+        return (span is not None and best is not None and best["similarity"] is not None
+                and best["score"] >= self.min_score
+                and span["coverage"] >= self.min_coverage and span["typed"]
+                and len(span["text"].split()) <= self.max_words)
+
+    @staticmethod
+    def format(span):
+        page = f", page {span['page'] + 1}" if isinstance(span["page"], int) else ""
+        return f"{' '.join(span['text'].split())} ({span['source']}{page})"
@@ -0,0 +1,164 @@
+# core/intents.py
+import os
+import re
+import threading
+from collections import Counter
+
+from core import metrics
+from core.bm25 import tokenize
+from core.chunker import sentences
+
+# Share of a query's content words that must belong to one intent to answer it directly
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.6"))
+INTENT_MAX_FACTS = int(os.getenv("INTENT_MAX_FACTS", "6"))
+
+TIME = re.compile(r"\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\b\d{1,2}:\d{2}\b|24\s*(?:hours|hrs|/\s*7)", re.I)
+PHONE = re.compile(r"(?:\+?\d[\d\s-]{6,}\d)")
+DEPARTMENT = re.compile(
+    r"\bDepartment of ([A-Z][A-Za-z&]+(?: (?:and|&) [A-Z][A-Za-z&]+| [A-Z][A-Za-z&]+)*)"
+    r"|\b([A-Z][A-Za-z&]+(?: [A-Z][A-Za-z&]+)?) Department\b"
+)
+
+# anchors: a sentence must mention one of these to be a fact for the intent, and a question
+#   must mention one to be answered from the facts ("phone number" alone isn't "emergency")
+# keywords: words in a question that point at the intent
+INTENTS = {
+    "opd_timings": {
+        "title": "OPD timings",
+        "anchors": {"opd", "outpatient", "timings", "timing"},
+        "keywords": {"opd", "outpatient", "timing", "timings", "time", "times", "hours", "open", "schedule", "clinic"},
+        "pattern": TIME,
+    },
+    "emergency": {
+        "title": "Emergency",
+        "anchors": {"emergency", "ambulance", "casualty"},
+        "keywords": {"emergency", "ambulance", "casualty", "er", "urgent", "number", "phone", "contact", "helpline", "call"},
+        "pattern": PHONE,
+    },
+    "departments": {
+        "title": "Departments",
+        "anchors": {"department", "departments", "specialties", "specialities", "specialty"},
+        "keywords": {"department", "departments", "specialties", "specialities", "specialty", "list", "available"},
+        "pattern": DEPARTMENT,
+    },
+}
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "which", "when", "where", "how", "do", "does", "can", "i",
+    "you", "your", "me", "my", "of", "for", "in", "at", "on", "to", "there", "please", "tell", "about", "hospital",
+    "dow", "give", "show", "all", "any", "and", "or", "kya", "hai", "hain", "ka", "ki", "ke", "have", "has",
+}
+
+# Words that don't change what a question asks for. Any other word an intent doesn't explain
+# ("cardiology", a doctor's name, "pharmacy") means the question is about something more specific
+# than the facts, so it goes to RAG.
+GENERIC_WORDS = {
+    "today", "now", "currently", "current", "usually", "normally", "exact", "exactly", "kindly", "know",
+    "want", "need", "like", "would", "could", "should", "will", "be", "it", "its", "us", "we", "our", "get",
+    "find", "check", "let", "just", "also", "still", "general", "regular", "usual", "these", "those",
+    "this", "that", "please", "thanks", "thank", "hi", "hello", "sir", "madam",
+}
+
+class FactTable:
+    # Structured answers for high-frequency intents, pulled from the chunks at ingestion time
+    def __init__(self, facts=None):
+        self.facts = facts or {name: [] for name in INTENTS}
+
+    @classmethod
+    def from_vector_store(cls, vector_db):
+        # For indexes saved before the fact table was persisted alongside them
+        table = cls()
+        for i in range(len(vector_db.index_to_docstore_id)):
+            table.add(vector_db.docstore.search(vector_db.index_to_docstore_id[i]))
+        return table
+
+    def add(self, doc):
+        where = {"source": os.path.basename(str(doc.metadata.get("source", ""))), "page": doc.metadata.get("page")}
+        for name, intent in INTENTS.items():
+            facts = self.facts.setdefault(name, [])
+            if name == "departments":
+                for match in intent["pattern"].finditer(doc.page_content):
+                    dept = (match.group(1) or match.group(2)).strip()
+                    if dept not in {fact["text"] for fact in facts}:
+                        facts.append(dict(where, text=dept))
+                continue
+            for sentence in sentences(doc.page_content):
+                if len(facts) >= INTENT_MAX_FACTS:
+                    break
+                if intent["anchors"].intersection(tokenize(sentence)) and intent["pattern"].search(sentence):
+                    if sentence not in {fact["text"] for fact in facts}:
+                        facts.append(dict(where, text=sentence))
+
+    def answer(self, name):
+        facts = self.facts.get(name)
+        if not facts:
+            return None
+        if name == "departments":
+            return "Departments: " + ", ".join(fact["text"] for fact in facts) + "."
+        lines = []
+        for fact in facts:
+            page = f", page {fact['page'] + 1}" if isinstance(fact.get("page"), int) else ""
+            lines.append(f"- {fact['text']} ({fact['source']}{page})")
+        return f"{INTENTS[name]['title']}:\n" + "\n".join(lines)
+
+ROUTED = metrics.Counter("chatbot_intent_total", "Questions answered by the intent fast path, by intent (none = sent to RAG)", ["intent"])
+
+class IntentRouter:
+    # Answers confident matches straight from the fact table; everything else goes to RAG.
+    # Counts hits per intent and remembers frequent misses so the table can be grown.
+    def __init__(self, table, min_confidence=INTENT_MIN_CONFIDENCE, max_tracked_misses=1000):
+        self.table = table
+        self.min_confidence = min_confidence
+        self.max_tracked_misses = max_tracked_misses
+        self.stats = Counter()
+        self.missed = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, query):
+        # Returns (intent, confidence); confidence is the share of content words the intent explains.
+        # An intent only counts when the question names one of its anchors and every other
+        # content word is one of its keywords or generic.
+        words = [w for w in tokenize(query) if w not in STOPWORDS]
+        if not words:
+            return None, 0.0
+        best, best_score = None, 0.0
+        for name, intent in INTENTS.items():
+            explained = intent["keywords"] | intent["anchors"]
+            if not intent["anchors"].intersection(words) or any(w not in explained | GENERIC_WORDS for w in words):
+                continue
+            score = sum(1 for w in words if w in explained) / len(words)
+            if score > best_score:
+                best, best_score = name, score
+        return best, best_score
+
+    def route(self, query):
+        # Returns the fast-path answer, or None to fall back to RAG
+        name, confidence = self.classify(query)
+        answer = self.table.answer(name) if name and confidence >= self.min_confidence else None
+        with self._lock:
+            self.stats["queries"] += 1
+            if answer is not None:
+                self.stats[f"hit:{name}"] += 1
+            else:
+                self.stats["misses"] += 1
+                key = " ".join(tokenize(query))
+                if key in self.missed or len(self.missed) < self.max_tracked_misses:
+                    self.missed[key] += 1
+        ROUTED.inc(intent=name if answer is not None else "none")
+        return answer
+
+    def hit_rate(self):
+        queries = self.stats["queries"]
+        return (queries - self.stats["misses"]) / queries if queries else 0.0
+
+    def top_misses(self, n=20):
+        with self._lock:
+            return self.missed.most_common(n)
+
+    def report(self, n=20):
+        # Hit rate, hits per intent and the most frequent misses, for /debug/intents
+        with self._lock:
+            hits = {key[4:]: count for key, count in self.stats.items() if key.startswith("hit:")}
+            queries = self.stats["queries"]
+        return {"queries": queries, "hit_rate": round(self.hit_rate(), 4), "hits": hits,
+                "top_misses": [{"query": query, "count": count} for query, count in self.top_misses(n)]}
@@ -0,0 +1,175 @@
+# core/memory.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from core.bm25 import tokenize
+from core.chunker import count_tokens, sentences
+from core.intents import STOPWORDS
+
+# Last turns kept word for word; older turns are folded into a short summary
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "3"))
+# Token budgets for the window (per answer) and the rolling summary
+MEMORY_ANSWER_TOKENS = int(os.getenv("MEMORY_ANSWER_TOKENS", "120"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+MEMORY_MAX_BYTES = int(os.getenv("MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+MEMORY_IDLE_SECONDS = float(os.getenv("MEMORY_IDLE_SECONDS", "1800"))
+
+FOLLOW_UP_START = re.compile(r"^\s*(?:and|also|what about|how about|what if|same for|or)\b", re.I)
+# Words that point back at the previous question's topic ("Is it open on Sunday?"); not the
+# existential "there" of "Is there a pharmacy?"
+PRONOUNS = {"it", "its", "they", "them", "their", "that", "those", "this", "these", "he", "she", "his", "her"}
+# Question words that say nothing about the topic
+FILLER = {"who", "whom", "whose", "why", "will", "would", "should", "could", "be", "did", "get", "know", "also",
+          "about", "what", "if", "same", "then", "else", "more", "other"}
+# Words that replace rather than add to the previous question's ("Saturday" -> "Sunday")
+SLOTS = [
+    {"monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "weekend", "weekday",
+     "today", "tomorrow", "morning", "evening", "night"},
+]
+
+def content_words(text):
+    return [w for w in tokenize(text) if w not in STOPWORDS and w not in PRONOUNS and w not in FILLER]
+
+def is_follow_up(query):
+    words = tokenize(query)
+    return bool(FOLLOW_UP_START.match(query)) or (len(words) <= 8 and bool(PRONOUNS.intersection(words)))
+
+def first_sentence(text, budget):
+    for sentence in sentences(text):
+        return sentence if count_tokens(sentence) <= budget else " ".join(sentence.split()[:budget])
+    return ""
+
+class _Session:
+    __slots__ = ("turns", "summary", "last_query", "seen", "size")
+
+    def __init__(self, window):
+        self.turns = deque(maxlen=window)  # (question, answer)
+        self.summary = deque()             # one line per turn that left the window
+        self.last_query = ""               # standalone form of the last question
+        self.seen = time.monotonic()
+        self.size = 0
+
+class ConversationMemory:
+    # Per-session chat history: the last few turns verbatim plus a rolling extractive summary
+    # of older ones, so the prompt stays bounded however long a chat runs. Sessions are LRU,
+    # dropped when idle or when the count / byte cap is reached.
+    def __init__(self, window=MEMORY_WINDOW_TURNS, answer_tokens=MEMORY_ANSWER_TOKENS,
+                 summary_tokens=MEMORY_SUMMARY_TOKENS, max_sessions=MEMORY_MAX_SESSIONS,
+                 max_bytes=MEMORY_MAX_BYTES, idle_seconds=MEMORY_IDLE_SECONDS):
+        self.window = max(1, window)
+        self.answer_tokens = answer_tokens
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def rewrite(self, session_id, query):
+        # Standalone version of a follow-up for retrieval and caching: adds the topic words of
+        # the previous question that the follow-up leaves out ("and what about Sunday?" after
+        # "OPD timings on Saturday?" -> "and what about Sunday? opd timings"). A follow-up with
+        # a topic of its own ("and the emergency number?") is left alone unless it points back
+        # with a pronoun ("what is its fee?").
+        with self._lock:
+            session = self._get(session_id)
+            previous = session.last_query if session else ""
+        if not previous or not is_follow_up(query):
+            return query
+        words = set(content_words(query))
+        replaced = set().union(*(slot for slot in SLOTS if slot & words))
+        if words - replaced and not PRONOUNS.intersection(tokenize(query)):
+            return query
+        carried = []
+        for word in content_words(previous):
+            if word not in words and word not in replaced and word not in carried:
+                carried.append(word)
+        return f"{query} {' '.join(carried)}" if carried else query
+
+    def history(self, session_id):
+        # Summary + window as prompt text, or "" for a new session
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                return ""
+            lines = []
+            if session.summary:
+                lines.append("Earlier: " + " ".join(session.summary))
+            for question, answer in session.turns:
+                lines.append(f"User: {question}\nAssistant: {answer}")
+        return "\n".join(lines)
+
+    def add(self, session_id, question, answer, standalone=None):
+        if not session_id:
+            return
+        answer = self._trim(answer)
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.window)
+            if len(session.turns) == self.window:
+                old_question, old_answer = session.turns[0]
+                session.summary.append(f"Q: {old_question} A: {first_sentence(old_answer, 40)}")
+                while len(session.summary) > 1 and count_tokens(" ".join(session.summary)) > self.summary_tokens:
+                    session.summary.popleft()
+            session.turns.append((question, answer))
+            session.last_query = standalone or question
+            self._resize(session_id, session)
+            self._evict()
+
+    def clear(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _trim(self, answer):
+        answer = answer.strip()
+        if count_tokens(answer) <= self.answer_tokens:
+            return answer
+        kept, used = [], 0
+        for sentence in sentences(answer):
+            used += count_tokens(sentence)
+            if used > self.answer_tokens:
+                break
+            kept.append(sentence)
+        return " ".join(kept) or first_sentence(answer, self.answer_tokens)
+
+    def _get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.seen > self.idle_seconds:
+            self._drop(session_id)
+            return None
+        session.seen = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _resize(self, session_id, session):
+        size = len(session_id) + len(session.last_query) + 300
+        size += sum(len(q) + len(a) for q, a in session.turns) + sum(len(line) for line in session.summary)
+        self._bytes += size - session.size
+        session.size = size
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first: stop at the first session that is neither idle nor over a cap
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if (now - session.seen > self.idle_seconds or len(self._sessions) > self.max_sessions
+                    or self._bytes > self.max_bytes):
+                self._drop(session_id)
+            else:
+                break
+
+    def _drop(self, session_id):
+        self._bytes -= self._sessions.pop(session_id).size
@@ -0,0 +1,188 @@
+# core/metrics.py
+# Minimal Prometheus-format metrics (histograms, counters, gauges) plus per-request context:
+# a request ID and the stage timings of the current request, for structured logs.
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger("chatbot.requests")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 4000, 8000)
+
+_registry = []
+_request_id = contextvars.ContextVar("request_id", default=None)
+# {"stages": {stage: ms}, "notes": {...}} for the current request
+_request = contextvars.ContextVar("request", default=None)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f"{self.name}{_label_str(self.labels, key)} {value}" for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        # function() -> {label tuple: value}, evaluated at scrape time
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        values = dict(self._values)
+        if self.function is not None:
+            values.update(self.function())
+        return [f"{self.name}{_label_str(self.labels, key)} {value}" for key, value in values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][i] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (buckets, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, buckets):
+                le = _label_str(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{le} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_label_str(self.labels + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {count}")
+        return lines
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram("chatbot_stage_seconds", "Time spent per pipeline stage", ["stage"])
+REQUEST_SECONDS = Histogram("chatbot_request_seconds", "HTTP request latency", ["route"])
+REQUESTS = Counter("chatbot_requests_total", "HTTP requests", ["route", "status"])
+CONTEXT_TOKENS = Histogram("chatbot_context_tokens", "Tokens of retrieved context sent to the LLM", buckets=TOKEN_BUCKETS)
+CONTEXT_TOKENS_SAVED = Counter("chatbot_context_tokens_saved_total", "Retrieved tokens dropped by dedup and the budget")
+CACHE_LOOKUPS = Counter("chatbot_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+INGESTED = Counter("chatbot_ingested_total", "Pages and chunks ingested", ["kind"])
+COALESCED = Counter("chatbot_coalesced_total", "Requests answered by another in-flight identical request "
+                    "(upstream calls saved)", ["path"])
+
+def _hit_ratios():
+    with CACHE_LOOKUPS._lock:
+        values = dict(CACHE_LOOKUPS._values)
+    totals = {}
+    for (cache, _), count in values.items():
+        totals[cache] = totals.get(cache, 0) + count
+    return {(cache,): round(values.get((cache, "hit"), 0) / total, 4) for cache, total in totals.items() if total}
+
+CACHE_HIT_RATIO = Gauge("chatbot_cache_hit_ratio", "Hits / lookups since start, per cache", ["cache"], function=_hit_ratios)
+
+def record_cache(cache, hit, count=1):
+    if count:
+        CACHE_LOOKUPS.inc(count, cache=cache, result="hit" if hit else "miss")
+
+@contextmanager
+def timer(stage):
+    # Observes the stage latency and adds it to the current request's stage timings
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        info = _request.get()
+        if info is not None:
+            stages = info["stages"]
+            stages[stage] = round(stages.get(stage, 0.0) + elapsed * 1000, 3)
+
+def note(key, value):
+    # Attach a value (token count, cache result, ...) to the current request's log line
+    info = _request.get()
+    if info is not None:
+        info["notes"][key] = value
+
+def start_request(request_id=None):
+    request_id = request_id or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    _request.set({"stages": {}, "notes": {}})
+    return request_id
+
+def current_request_id():
+    return _request_id.get()
+
+def log_request(route, status, duration, **fields):
+    # One JSON line per request, with the request ID, per-stage timings (ms) and notes
+    REQUEST_SECONDS.observe(duration, route=route)
+    REQUESTS.inc(route=route, status=status)
+    info = _request.get() or {"stages": {}, "notes": {}}
+    record = {"request_id": _request_id.get(), "route": route, "status": status,
+              "duration_ms": round(duration * 1000, 3), "stages": info["stages"]}
+    record.update(info["notes"])
+    record.update(fields)
+    logger.info(json.dumps(record, default=str))
@@ -1,11 +1,226 @@
 # core/pdf_loader.py
 from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import logging
 import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
 
 # PDF path setup
 PDF_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "Dow_Hospital_Complete_Information.pdf")
+# Set PDF_DIR to ingest every PDF under a directory tree instead of the single PDF
+PDF_DIR = os.getenv("PDF_DIR", "")
+DEFAULT_SOURCE = PDF_DIR or PDF_PATH
+# Parser processes for directory ingestion (0 = one per CPU)
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", "0")) or os.cpu_count() or 1
+# Extracted page text is cached per PDF content hash, so an unchanged PDF is never parsed twice
+EXTRACT_CACHE = os.getenv("EXTRACT_CACHE", "1") == "1"
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", os.path.join(
+    os.getenv("INDEX_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "index")), "extracted"))
+# A PDF is split across processes in ranges of this many pages
+EXTRACT_MIN_PAGES = int(os.getenv("EXTRACT_MIN_PAGES", "16"))
+
+def parse_pdf(pdf_path):
+    # Uncached PyPDFLoader parse
+    return PyPDFLoader(pdf_path).load()
+
+def load_pdf(pdf_path=PDF_PATH, processes=INGEST_PROCESSES):
+    if not EXTRACT_CACHE:
+        return parse_pdf(pdf_path)
+    return list(load_pages(pdf_path, processes))
+
+def iter_pages(pdf_path=PDF_PATH):
+    # Yields one page Document at a time; from the extraction cache when the PDF is unchanged
+    if EXTRACT_CACHE:
+        yield from load_pages(pdf_path)
+    else:
+        yield from PyPDFLoader(pdf_path).lazy_load()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_atomic(path, data, opener=open):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    os.close(fd)
+    try:
+        with opener(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+def content_key(path):
+    # sha256 of the file, re-hashed only when its size or mtime changed since last time
+    stat = os.stat(path)
+    stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    sidecar = os.path.join(EXTRACT_CACHE_DIR, "paths",
+                           hashlib.sha1(os.path.abspath(path).encode()).hexdigest() + ".json")
+    try:
+        with open(sidecar) as f:
+            known = json.load(f)
+        if {k: known.get(k) for k in stamp} == stamp:
+            return known["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+    sha = file_sha256(path)
+    _write_atomic(sidecar, json.dumps(dict(stamp, sha256=sha)).encode())
+    return sha
+
+def pdf_info(reader, total):
+    # Document-level metadata the way PyPDFLoader reports it: info keys without the leading "/",
+    # lower-cased, PDF dates ("D:20240115093000+05'00'") as ISO strings
+    info = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    for key, value in (reader.metadata or {}).items():
+        key, value = str(key).lstrip("/").lower(), str(value)
+        if key in ("creationdate", "moddate") and value.startswith("D:"):
+            value = _pdf_date(value)
+        info[key] = value
+    info["total_pages"] = total
+    return info
+
+def _pdf_date(value):
+    stamp = value[2:].replace("'", "").replace("Z", "+")
+    for text, fmt in ((stamp, "%Y%m%d%H%M%S%z"), (stamp[:14], "%Y%m%d%H%M%S")):
+        try:
+            return datetime.strptime(text, fmt).isoformat()
+        except ValueError:
+            pass
+    return value
+
+def _page(reader, i):
+    return {"text": reader.pages[i].extract_text(extraction_mode="plain").strip(), "page_label": reader.page_labels[i]}
+
+def _extract_range(pdf_path, start, end):
+    # Runs in a worker process: text + labels of pages [start, end), the way PyPDFLoader extracts them
+    import pypdf
+    reader = pypdf.PdfReader(pdf_path)
+    return [_page(reader, i) for i in range(start, end)]
+
+def _extract(pdf_path, processes):
+    # Yields the document info, then each page's {"text", "page_label"} in order. With several
+    # processes, ranges of EXTRACT_MIN_PAGES pages are extracted a few ahead of the consumer.
+    import pypdf
+    reader = pypdf.PdfReader(pdf_path)
+    total = len(reader.pages)
+    yield pdf_info(reader, total)
+    step = max(1, EXTRACT_MIN_PAGES)
+    processes = max(1, min(processes, total // step))
+    if processes == 1:
+        for i in range(total):
+            yield _page(reader, i)
+        return
+    ranges = iter(range(0, total, step))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        for start in ranges:
+            pending.append(pool.submit(_extract_range, pdf_path, start, min(start + step, total)))
+            if len(pending) >= 2 * processes:
+                break
+        while pending:
+            future = pending.popleft()
+            start = next(ranges, None)
+            if start is not None:
+                pending.append(pool.submit(_extract_range, pdf_path, start, min(start + step, total)))
+            yield from future.result()
+
+def _document(pdf_path, info, i, page):
+    return Document(page_content=page["text"], metadata=dict(info, source=pdf_path, page=i, page_label=page["page_label"]))
+
+def load_pages(pdf_path, processes=INGEST_PROCESSES):
+    # Yields page Documents like PyPDFLoader.lazy_load(), one at a time. The text is cached as
+    # gzipped JSON lines (document info, then one line per page) in
+    # EXTRACT_CACHE_DIR/<sha256>.jsonl.gz; a miss is extracted and written out page by page.
+    cache_path = os.path.join(EXTRACT_CACHE_DIR, content_key(pdf_path) + ".jsonl.gz")
+    try:
+        cached = gzip.open(cache_path, "rt", encoding="utf-8")
+        info = json.loads(cached.readline())
+    except (OSError, ValueError):
+        cached = None
+    if cached is not None:
+        with cached:
+            count = 0
+            for count, line in enumerate(cached, 1):
+                yield _document(pdf_path, info, count - 1, json.loads(line))
+        logger.info("%s: %d pages from the extraction cache", os.path.basename(pdf_path), count)
+        return
+
+    start = time.perf_counter()
+    os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=EXTRACT_CACHE_DIR, prefix=".tmp-")
+    os.close(fd)
+    try:
+        with gzip.open(tmp, "wt", encoding="utf-8") as out:
+            pages = _extract(pdf_path, processes)
+            info = next(pages)
+            out.write(json.dumps(info, default=str) + "\n")
+            count = 0
+            for count, page in enumerate(pages, 1):
+                out.write(json.dumps(page) + "\n")
+                yield _document(pdf_path, info, count - 1, page)
+        # Only a complete extraction is cached
+        os.replace(tmp, cache_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    logger.info("%s: extracted %d pages in %.2fs", os.path.basename(pdf_path), count, time.perf_counter() - start)
+
+def find_pdfs(root):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        paths.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.lower().endswith(".pdf"))
+    return paths
+
+def _parse_file(path):
+    # Runs in a worker process; files are already spread over the pool, so one process per file
+    start = time.perf_counter()
+    return load_pdf(path, processes=1), time.perf_counter() - start
+
+def iter_directory(root, processes=INGEST_PROCESSES):
+    # Parses the PDFs under root on a process pool and yields their pages in file order.
+    # Only a few files are parsed ahead of the consumer, so memory stays bounded.
+    paths = find_pdfs(root)
+    if not paths:
+        raise FileNotFoundError(f"No PDF files found under {root}")
+    processes = max(1, min(processes, len(paths)))
+    logger.info("Parsing %d PDFs with %d processes", len(paths), processes)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        queued = iter(paths)
+        for path in queued:
+            pending.append((path, pool.submit(_parse_file, path)))
+            if len(pending) >= 2 * processes:
+                break
+        done = 0
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(queued, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(_parse_file, next_path)))
+            pages, seconds = future.result()
+            done += 1
+            source = os.path.relpath(path, root)
+            logger.info("[%d/%d] %s: %d pages in %.2fs", done, len(paths), source, len(pages), seconds)
+            for page in pages:
+                page.metadata["source"] = source
+                yield page
 
-def load_pdf():
-    loader = PyPDFLoader(PDF_PATH)
-    documents = loader.load()
-    return documents
+def iter_documents(source=DEFAULT_SOURCE):
+    # A single PDF or a directory of PDFs
+    if os.path.isdir(source):
+        return iter_directory(source)
+    return iter_pages(source)
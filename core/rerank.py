@@ -0,0 +1,105 @@
+# core/rerank.py
+import os
+
+from core.bm25 import tokenize
+from core.intents import STOPWORDS
+
+# Weight of query-term coverage vs. vector similarity in the rerank score
+RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.4"))
+# MMR trade-off: 1.0 = relevance only, lower values favour passages that add something new
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+# Passages sharing more than this fraction of their words with a kept one are redundant
+RERANK_MAX_OVERLAP = float(os.getenv("RERANK_MAX_OVERLAP", "0.8"))
+# Absolute floor and floor relative to the best passage. Vector similarities depend on the
+# embedding model, so tune RETRIEVAL_MIN_SCORE per model (python -m core.explain shows scores).
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.3"))
+RETRIEVAL_RELATIVE_CUTOFF = float(os.getenv("RETRIEVAL_RELATIVE_CUTOFF", "0.75"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+
+def content_terms(text):
+    return {w for w in tokenize(text) if w not in STOPWORDS}
+
+def coverage(idf, query_terms, doc_terms):
+    # IDF-weighted share of the query's content words that appear in the passage
+    total = sum(idf(term) for term in query_terms)
+    if not total:
+        return 0.0
+    return sum(idf(term) for term in query_terms & doc_terms) / total
+
+def overlap(a, b):
+    # Share of the smaller passage's words found in the other
+    return len(a & b) / max(1, min(len(a), len(b)))
+
+class Reranker:
+    # Scores over-fetched candidates on CPU (vector similarity + IDF-weighted query-term
+    # coverage), orders them with MMR and keeps as many as clear the cutoffs: one passage for
+    # a question with a single strong match, up to max_k when several are close.
+    # Every candidate gets a reason, for debugging.
+    def __init__(self, idf, max_k, min_k=RETRIEVAL_MIN_K, min_score=RETRIEVAL_MIN_SCORE,
+                 relative_cutoff=RETRIEVAL_RELATIVE_CUTOFF, lexical_weight=RERANK_LEXICAL_WEIGHT,
+                 mmr_lambda=RERANK_MMR_LAMBDA, max_overlap=RERANK_MAX_OVERLAP):
+        self.idf = idf
+        self.max_k = max_k
+        self.min_k = max(1, min_k)
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+        self.lexical_weight = lexical_weight
+        self.mmr_lambda = mmr_lambda
+        self.max_overlap = max_overlap
+
+    def coverage(self, query_terms, doc_terms):
+        return coverage(self.idf, query_terms, doc_terms)
+
+    def rerank(self, query, candidates):
+        # candidates: [(doc_id, doc, similarity or None)] in fused order; similarity is the
+        # cosine from the vector search, None for lexical-only retrieval.
+        # Returns (kept docs, trace) with one trace entry per candidate, kept ones first.
+        query_terms = content_terms(query)
+        known = [similarity for _, _, similarity in candidates if similarity is not None]
+        # Candidates found only by BM25 ranked below every vector hit, so they're no more
+        # similar than the weakest of those
+        floor = min(known) if known else None
+        scored = []
+        for doc_id, doc, similarity in candidates:
+            terms = content_terms(doc.page_content)
+            lexical = self.coverage(query_terms, terms)
+            if floor is None:
+                score = lexical
+            else:
+                similarity = floor if similarity is None else similarity
+                score = (1 - self.lexical_weight) * similarity + self.lexical_weight * lexical
+            scored.append({"id": doc_id, "doc": doc, "terms": terms, "similarity": similarity,
+                           "lexical": round(lexical, 4), "score": round(score, 4)})
+        if not scored:
+            return [], []
+
+        best = max(item["score"] for item in scored)
+        kept, trace, remaining = [], [], sorted(scored, key=lambda item: item["score"], reverse=True)
+        while remaining:
+            # MMR: next is the most relevant passage after a penalty for repeating kept ones
+            for item in remaining:
+                item["overlap"] = max((overlap(item["terms"], k["terms"]) for k in kept), default=0.0)
+            item = max(remaining, key=lambda i: self.mmr_lambda * i["score"] - (1 - self.mmr_lambda) * i["overlap"])
+            remaining.remove(item)
+            if len(kept) >= self.max_k:
+                reason = "max_k"
+            elif len(kept) < self.min_k and item["overlap"] < self.max_overlap:
+                reason = "kept" if item["score"] >= self.min_score else "kept_min_k"
+            elif item["score"] < self.min_score:
+                reason = "below_min_score"
+            elif item["score"] < self.relative_cutoff * best:
+                reason = "below_relative_cutoff"
+            elif item["overlap"] >= self.max_overlap:
+                reason = "redundant"
+            else:
+                reason = "kept"
+            if reason.startswith("kept"):
+                kept.append(item)
+            trace.append({
+                "id": item["id"], "source": item["doc"].metadata.get("source"), "page": item["doc"].metadata.get("page"),
+                "similarity": None if item["similarity"] is None else round(item["similarity"], 4),
+                "lexical": item["lexical"], "score": item["score"], "overlap": round(item["overlap"], 4),
+                "reason": reason,
+            })
+        trace.sort(key=lambda entry: not entry["reason"].startswith("kept"))
+        return [item["doc"] for item in kept], trace
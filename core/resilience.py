@@ -0,0 +1,319 @@
+# core/resilience.py
+# Keeps a slow or failing OpenAI from taking the chatbot down with it. Every LLM call gets a
+# deadline, retryable failures are retried with jittered backoff, a call slower than usual can be
+# hedged with a duplicate request, and after repeated failures a circuit breaker stops calling
+# upstream for a while. QAChain answers from the retrieved passages when a call gives up.
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds per attempt (to the first token when streaming, then between tokens) and for all attempts
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))
+# Retries after a timeout, connection error, 429 or 5xx; backoff is random in [0, min(max, base * 2^n)]
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+# Send a duplicate request when a call is slower than this percentile of recent calls (0 = never)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Consecutive failed attempts that open the circuit, and seconds before trying upstream again
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+# Threads running sync LLM calls; a call abandoned at its deadline holds one until it returns
+LLM_THREADS = int(os.getenv("LLM_THREADS", "32"))
+
+ATTEMPTS = metrics.Counter("chatbot_llm_attempts_total", "LLM call attempts by outcome", ["outcome"])
+HEDGES = metrics.Counter("chatbot_llm_hedges_total", "Hedged duplicate LLM requests sent, and how many answered first", ["outcome"])
+DEGRADED = metrics.Counter("chatbot_degraded_total", "Answers given from retrieved passages because the LLM failed", ["reason"])
+_breakers = []
+
+def _breaker_states():
+    return {(breaker.name,): CircuitBreaker.STATES.index(breaker.state) for breaker in _breakers}
+
+BREAKER_STATE = metrics.Gauge("chatbot_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["name"],
+                              function=_breaker_states)
+
+class UpstreamError(Exception):
+    # The LLM couldn't answer; reason is "timeout", "circuit_open" or "error"
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+def retryable(error):
+    # Timeouts, connection errors, rate limits and server errors; not bad requests or auth
+    if isinstance(error, TimeoutError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+class CircuitBreaker:
+    # closed: calls go through. open: calls fail at once for reset_after seconds. half-open: one
+    # probe call goes through; success closes the circuit, failure opens it again.
+    STATES = ("closed", "half_open", "open")
+
+    def __init__(self, name="llm", failures=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.name = name
+        self.failures = max(1, failures)
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._failed = 0
+        self._opened = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        _breakers.append(self)
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened >= self.reset_after:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return self.state == "closed"
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit %s closed", self.name)
+            self.state, self._failed, self._probing = "closed", 0, False
+
+    def release(self):
+        # The call was abandoned by its caller without an outcome; let another probe through
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failed += 1
+            if self.state == "half_open" or (self.state == "closed" and self._failed >= self.failures):
+                logger.warning("Circuit %s open after %d failed calls; retrying in %.0fs",
+                               self.name, self._failed, self.reset_after)
+                self.state, self._opened, self._probing = "open", time.monotonic(), False
+
+class UpstreamPolicy:
+    # call(fn), acall(fn) and stream(fn) run an LLM call under the deadline / retry / hedge /
+    # breaker policy and raise UpstreamError when it gives up
+    def __init__(self, timeout=LLM_TIMEOUT, deadline=LLM_DEADLINE, retries=LLM_RETRIES, backoff=LLM_BACKOFF,
+                 backoff_max=LLM_BACKOFF_MAX, hedge_percentile=LLM_HEDGE_PERCENTILE, breaker=None, threads=LLM_THREADS):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.threads = threads
+        self._latencies = deque(maxlen=200)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        # Seconds after which a duplicate request is sent, or None
+        if self.hedge_percentile <= 0 or len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))]
+
+    def _succeeded(self, start=None):
+        # start is given for whole calls; only those feed the hedging percentile
+        if start is not None:
+            self._latencies.append(time.perf_counter() - start)
+        self.breaker.success()
+        ATTEMPTS.inc(outcome="ok")
+
+    def _failed(self, error):
+        # Records a failed attempt; returns the UpstreamError to raise if no retry follows
+        outcome = "timeout" if isinstance(error, TimeoutError) else "error"
+        ATTEMPTS.inc(outcome=outcome)
+        if not retryable(error):
+            # Upstream answered (e.g. 400), so it's healthy; retrying won't help
+            self.breaker.success()
+            return UpstreamError("error", str(error)), False
+        self.breaker.failure()
+        return UpstreamError(outcome, str(error)), True
+
+    def _attempts(self):
+        # Yields the timeout for each attempt, sleeping the backoff between them
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= end:
+                    return
+                time.sleep(delay)
+            yield min(self.timeout, end - time.monotonic())
+
+    def _begin(self):
+        if not self.breaker.allow():
+            raise UpstreamError("circuit_open", f"Circuit {self.breaker.name} is open")
+
+    def call(self, fn):
+        # fn() runs on the policy's threads, so a hung call is abandoned at its deadline
+        # instead of pinning the request thread
+        error = None
+        for timeout in self._attempts():
+            self._begin()
+            try:
+                return self._attempt(fn, timeout)
+            except Exception as e:
+                error, retry = self._failed(e)
+                if not retry:
+                    break
+        raise error
+
+    def _attempt(self, fn, timeout):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="llm")
+        start = time.perf_counter()
+        first = self._pool.submit(fn)
+        pending, hedge, error = {first}, self.hedge_delay(), None
+        while pending:
+            elapsed = time.perf_counter() - start
+            if elapsed >= timeout:
+                break
+            wait_for = timeout - elapsed
+            if hedge is not None:
+                wait_for = min(wait_for, max(0.0, hedge - elapsed))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        HEDGES.inc(outcome="won")
+                    self._succeeded(start)
+                    return future.result()
+                error = future.exception()
+            if hedge is not None and pending and time.perf_counter() - start >= hedge:
+                HEDGES.inc(outcome="sent")
+                pending.add(self._pool.submit(fn))
+                hedge = None
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"LLM call timed out after {timeout:.1f}s")
+
+    async def acall(self, fn):
+        # fn is a zero-argument coroutine function; the attempt is cancelled at its deadline
+        error = None
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= end:
+                    break
+                await asyncio.sleep(delay)
+            self._begin()
+            try:
+                return await self._aattempt(fn, min(self.timeout, end - time.monotonic()))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                error, retry = self._failed(e)
+                if not retry:
+                    break
+        raise error
+
+    async def _aattempt(self, fn, timeout):
+        start = time.perf_counter()
+        first = asyncio.ensure_future(fn())
+        pending, hedge, error = {first}, self.hedge_delay(), None
+        try:
+            while pending:
+                elapsed = time.perf_counter() - start
+                if elapsed >= timeout:
+                    break
+                wait_for = timeout - elapsed
+                if hedge is not None:
+                    wait_for = min(wait_for, max(0.0, hedge - elapsed))
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            HEDGES.inc(outcome="won")
+                        self._succeeded(start)
+                        return task.result()
+                    error = task.exception()
+                if hedge is not None and pending and time.perf_counter() - start >= hedge:
+                    HEDGES.inc(outcome="sent")
+                    pending.add(asyncio.ensure_future(fn()))
+                    hedge = None
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"LLM call timed out after {timeout:.1f}s")
+
+    def stream(self, fn):
+        # fn() returns an iterator of chunks. Failures before the first chunk are retried; once
+        # chunks have been yielded a failure is raised as is, since they can't be taken back.
+        # Streams aren't hedged.
+        error = None
+        for timeout in self._attempts():
+            self._begin()
+            started = False
+            try:
+                for chunk in _pump(fn, timeout, self.timeout):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The client went away; chunks arriving means upstream is fine
+                if started:
+                    self.breaker.success()
+                else:
+                    self.breaker.release()
+                raise
+            except Exception as e:
+                if started:
+                    self._failed(e)
+                    raise
+                error, retry = self._failed(e)
+                if not retry:
+                    break
+                continue
+            self._succeeded()
+            return
+        raise error
+
+def _pump(fn, first_timeout, idle_timeout):
+    # Iterates fn() on its own thread so a stalled stream can be given up on
+    items, stop = queue.Queue(), threading.Event()
+
+    def run():
+        try:
+            for chunk in fn():
+                if stop.is_set():
+                    return
+                items.put(("chunk", chunk))
+            items.put(("done", None))
+        except Exception as e:
+            items.put(("error", e))
+
+    threading.Thread(target=run, name="llm-stream", daemon=True).start()
+    timeout = first_timeout
+    try:
+        while True:
+            try:
+                kind, value = items.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                raise TimeoutError(f"LLM stream stalled for {timeout:.1f}s") from None
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+            timeout = idle_timeout
+    finally:
+        stop.set()
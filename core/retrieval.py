@@ -0,0 +1,110 @@
+# core/retrieval.py
+import os
+from collections import Counter
+
+from core import metrics
+from core.bm25 import tokenize
+from core.embeddings import get_bm25, search_ids_by_vectors
+from core.rerank import Reranker
+
+# Most passages sent to the LLM; the reranker sends fewer when only a few are relevant
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+# Candidates taken from each of BM25 and FAISS before fusing
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+# Best fused candidates passed to the reranker
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+QUESTION_WORDS = {"what", "when", "where", "which", "who", "whom", "how", "why",
+                  "is", "are", "can", "could", "do", "does", "should", "tell", "explain"}
+
+def is_keyword_query(query):
+    # Names, ward numbers, phone extensions, quoted phrases and two-three word lookups
+    terms = tokenize(query)
+    if not terms:
+        return False
+    if '"' in query or any(term.isdigit() for term in terms):
+        return True
+    return len(terms) <= 3 and not QUESTION_WORDS.intersection(terms)
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K):
+    # Each ranking is a list of doc ids, best first
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class HybridRetriever:
+    # BM25 + FAISS fused with reciprocal rank fusion. Keyword-like queries that BM25 can
+    # answer skip the vector side, so they never wait on an embedding call.
+    def __init__(self, vector_db, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, candidates=RERANK_CANDIDATES):
+        self.vector_db = vector_db
+        self.bm25 = get_bm25(vector_db)
+        self.embeddings = vector_db.embeddings
+        self.k = k
+        self.fetch_k = fetch_k
+        self.candidates = max(k, candidates)
+        self.reranker = Reranker(self.bm25.idf, max_k=k)
+
+    def lexical_only(self, query):
+        return is_keyword_query(query) and bool(self.bm25.search(query, 1))
+
+    def invoke(self, query, traces=None):
+        # traces, if given, gets the rerank trace (scores and reasons) of the query appended
+        if self.lexical_only(query):
+            return self._lexical(query, traces)
+        with metrics.timer("embed"):
+            vector = self.embeddings.embed_query(query)
+        return self.search(query, vector, traces)
+
+    def retrieve(self, query, vector, traces=None):
+        # For callers that embedded the query themselves; vector is None for keyword queries
+        if vector is None:
+            return self._lexical(query, traces)
+        return self.search(query, vector, traces)
+
+    def explain(self, query):
+        # Every candidate with its scores and why it was kept or cut, for debugging
+        traces = []
+        if self.lexical_only(query):
+            self._lexical(query, traces)
+        else:
+            self.search_many([query], [self.embeddings.embed_query(query)], traces)
+        return traces[0]
+
+    def _lexical(self, query, traces=None):
+        metrics.note("retrieval", "lexical")
+        with metrics.timer("bm25"):
+            hits = self.bm25.search(query, self.candidates)
+        return self._rerank(query, [doc_id for doc_id, _ in hits], None, traces)
+
+    def search(self, query, vector, traces=None):
+        return self.search_many([query], [vector], traces)[0]
+
+    def search_many(self, queries, vectors, traces=None):
+        # One FAISS call for all queries, then fuse each with its BM25 ranking and rerank
+        with metrics.timer("faiss"):
+            vector_hits = search_ids_by_vectors(self.vector_db, vectors, self.fetch_k)
+        results = []
+        for query, hits in zip(queries, vector_hits):
+            with metrics.timer("bm25"):
+                lexical = [doc_id for doc_id, _ in self.bm25.search(query, self.fetch_k)]
+            fused = reciprocal_rank_fusion(lexical, [doc_id for doc_id, _ in hits])
+            # Squared L2 distance between unit vectors -> cosine similarity
+            similarity = {doc_id: 1 - distance / 2 for doc_id, distance in hits}
+            results.append(self._rerank(query, fused[:self.candidates], similarity, traces))
+        return results
+
+    def _rerank(self, query, doc_ids, similarity, traces=None):
+        with metrics.timer("rerank"):
+            candidates = [
+                (doc_id, self.vector_db.docstore.search(doc_id), None if similarity is None else similarity.get(doc_id))
+                for doc_id in doc_ids
+            ]
+            docs, trace = self.reranker.rerank(query, candidates)
+        metrics.note("passages", len(docs))
+        metrics.note("cutoffs", dict(Counter(entry["reason"] for entry in trace)))
+        if traces is not None:
+            traces.append(trace)
+        return docs
@@ -0,0 +1,103 @@
+# core/singleflight.py
+# Coalesces concurrent identical work: the first caller for a key computes, callers arriving
+# while it runs wait and get the same result (or exception) instead of repeating it.
+import asyncio
+import threading
+
+from core import metrics
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    # For threads (Flask). begin/finish are for callers like generators that can't wrap their
+    # work in one function; do() covers the rest.
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        # (call, True) for the caller that must compute, (call, False) for one that should wait()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result, call.error = result, error
+        call.done.set()
+
+    def wait(self, call):
+        metrics.COALESCED.inc(path=self.name)
+        metrics.note("coalesced", True)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def __len__(self):
+        return len(self._calls)
+
+class _LeaderCancelled(Exception):
+    pass
+
+class AsyncSingleFlight:
+    # Same for coroutines on one event loop (ASGI). If the computing request is cancelled
+    # (client went away), one of the waiters takes over instead of failing.
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, fn):
+        # fn is a zero-argument coroutine function
+        while key in self._calls:
+            metrics.COALESCED.inc(path=self.name)
+            metrics.note("coalesced", True)
+            try:
+                return await asyncio.shield(self._calls[key])
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't let asyncio warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,64 @@
+# core/warmup.py
+# Runs slow startup work (imports, index load/build) on a background thread so the server can
+# bind its port and answer health checks straight away
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds clients are told to wait (Retry-After) while warming up
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", "5"))
+
+class Warmup:
+    def __init__(self, load, name="warmup"):
+        self.load = load
+        self.name = name
+        self.state = "starting"
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._started = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._started = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.load()
+            self.state = "ready"
+        except Exception as e:
+            logger.exception("Warm-up failed")
+            self.error = str(e)
+            self.state = "failed"
+        self.seconds = round(time.monotonic() - self._started, 3)
+        logger.info("Warm-up %s in %.1fs", self.state, self.seconds)
+        self._done.set()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def wait(self, timeout=None):
+        # Blocks until warm-up finishes (or timeout); returns whether it succeeded
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self):
+        info = {"status": self.state}
+        if self.seconds is not None:
+            info["warmup_seconds"] = self.seconds
+        elif self._started is not None:
+            info["elapsed_seconds"] = round(time.monotonic() - self._started, 3)
+        if self.error:
+            info["error"] = self.error
+        return info
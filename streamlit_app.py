@@ -1,8 +1,9 @@
 import streamlit as st
 import os
+import uuid
 from dotenv import load_dotenv
-from core.pdf_loader import load_pdf
-from core.embeddings import create_vector_store
+from core.embeddings import get_vector_store
+from core.pdf_loader import DEFAULT_SOURCE
 from core.chatbot import create_chatbot
 
 # Load environment variables
@@ -107,7 +108,7 @@ st.markdown("""
 def initialize_system():
     try:
         # Check if file exists
-        pdf_path = os.path.join("data", "Dow_Hospital_Complete_Information.pdf")
+        pdf_path = DEFAULT_SOURCE
         if not os.path.exists(pdf_path):
             st.error(f"Critical Error: PDF not found at {pdf_path}")
             return None
@@ -125,9 +126,8 @@ def initialize_system():
             st.info("Format: OPENAI_API_KEY = 'sk-...'")
             return None
 
-        # Silent initialization
-        docs = load_pdf()
-        vector_db = create_vector_store(docs)
+        # Silent initialization (reuses the saved index when the PDF is unchanged)
+        vector_db = get_vector_store()
         return create_chatbot(vector_db)
     except Exception as e:
         st.error(f"Initialization Failed: {str(e)}")
@@ -138,11 +138,16 @@ st.title("🏥 Dow Hospital Assistant")
 st.markdown("<p style='opacity: 0.7; font-size: 0.9em;'>AI-powered medical inquiry assistant</p>", unsafe_allow_html=True)
 st.markdown("---")
 
+# Messages kept on screen; the chatbot keeps its own bounded history per session
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", "50"))
+
 # Initialize Session State
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "assistant", "content": "Hello! I am your Dow Hospital Assistant. How can I help you today?"}
     ]
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Show messages
 for message in st.session_state.messages:
@@ -168,14 +173,17 @@ if chatbot:
         st.session_state.messages.append({"role": "user", "content": prompt})
 
         try:
-            with st.spinner("Searching records..."):
-                result = chatbot.invoke({"query": prompt})
-                response = result.get("result", "I couldn't find specific information on that.")
-            
+            # Stream tokens into the bubble as they arrive
             with st.chat_message("assistant"):
-                st.markdown(response)
+                response = st.write_stream(chatbot.stream({"query": prompt, "session_id": st.session_state.session_id}))
+                if not response:
+                    response = "I couldn't find specific information on that."
+                    st.markdown(response)
             
             st.session_state.messages.append({"role": "assistant", "content": response})
+            # Keep the greeting and the latest messages
+            if len(st.session_state.messages) > MAX_MESSAGES:
+                st.session_state.messages = st.session_state.messages[:1] + st.session_state.messages[-(MAX_MESSAGES - 1):]
         except Exception as e:
             st.error(f"Something went wrong. Please try again.")
 else:
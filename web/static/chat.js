@@ -0,0 +1,177 @@
+const msgInput = document.getElementById("msg");
+const chatBox = document.querySelector(".chat-box");
+const emojiBtn = document.getElementById("emojiBtn");
+const emojiPicker = document.getElementById("emojiPicker");
+const cameraBtn = document.getElementById("cameraBtn");
+const attachBtn = document.getElementById("attachBtn");
+const fileInput = document.getElementById("fileInput");
+const cameraModal = document.getElementById("cameraModal");
+const cameraVideo = document.getElementById("cameraVideo");
+const cameraCanvas = document.getElementById("cameraCanvas");
+const captureBtn = document.getElementById("captureBtn");
+const closeCameraBtn = document.getElementById("closeCameraBtn");
+const uploadIndicator = document.getElementById("uploadIndicator");
+
+let lastMessageDate = null;
+const emojis = ['😀', '😂', '😍', '🥰', '😢', '😭', '😱', '😎', '🤔', '👍', '❤️', '🎉', '🙏', '✨', '💯', '😃', '😄', '😁', '😆', '😅', '🤣', '😉', '😊', '😇', '🤩', '😘', '😗', '😚', '😙', '🥲', '😋', '😛', '😜', '🤪', '😌', '😔', '😑', '😐', '😏', '😒', '🙁', '😬', '😮', '😯', '😲', '😳', '🥺', '😦', '😧', '😨', '😰', '😥', '😞', '😓', '😩', '😫', '🥱', '😤', '😡', '😠', '💀', '💩', '🤡', '👹', '👻', '👽', '👾', '🤖', '💋', '💌', '💘', '💝', '💖', '💗', '💓', '💞', '💕'];
+
+function initEmojis() {
+    emojis.forEach(emoji => {
+        const item = document.createElement('div');
+        item.className = 'emoji-item';
+        item.textContent = emoji;
+        item.addEventListener('click', () => {
+            msgInput.value += emoji;
+            msgInput.focus();
+            emojiPicker.classList.remove('show');
+        });
+        emojiPicker.appendChild(item);
+    });
+}
+
+emojiBtn.addEventListener('click', (e) => {
+    e.preventDefault();
+    emojiPicker.classList.toggle('show');
+});
+
+document.addEventListener('click', (e) => {
+    if (!emojiPicker.contains(e.target) && e.target !== emojiBtn && !emojiBtn.contains(e.target)) {
+        emojiPicker.classList.remove('show');
+    }
+});
+
+cameraBtn.addEventListener('click', async (e) => {
+    e.preventDefault();
+    try {
+        const stream = await navigator.mediaDevices.getUserMedia({ video: { facingMode: 'user' } });
+        cameraVideo.srcObject = stream;
+        cameraModal.classList.add('show');
+    } catch (err) {
+        alert('Camera access denied.');
+    }
+});
+
+closeCameraBtn.addEventListener('click', () => {
+    cameraVideo.srcObject.getTracks().forEach(track => track.stop());
+    cameraModal.classList.remove('show');
+});
+
+captureBtn.addEventListener('click', () => {
+    const ctx = cameraCanvas.getContext('2d');
+    cameraCanvas.width = cameraVideo.videoWidth;
+    cameraCanvas.height = cameraVideo.videoHeight;
+    ctx.drawImage(cameraVideo, 0, 0);
+    addMessage('📷 Photo: ' + new Date().toLocaleTimeString(), true);
+    cameraVideo.srcObject.getTracks().forEach(track => track.stop());
+    cameraModal.classList.remove('show');
+});
+
+attachBtn.addEventListener('click', (e) => {
+    e.preventDefault();
+    fileInput.click();
+});
+
+fileInput.addEventListener('change', (e) => {
+    if (e.target.files.length > 0) {
+        const file = e.target.files[0];
+        uploadIndicator.textContent = '✅ ' + file.name;
+        uploadIndicator.classList.add('show');
+        addMessage('📎 ' + file.name, true);
+        setTimeout(() => uploadIndicator.classList.remove('show'), 3000);
+    }
+});
+
+function getTime() {
+    const now = new Date();
+    return now.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
+}
+
+function addMessage(text, isUser) {
+    const now = new Date();
+    const today = new Date();
+    const yesterday = new Date(today);
+    yesterday.setDate(yesterday.getDate() - 1);
+    
+    if (lastMessageDate !== now.toDateString()) {
+        let dateStr = 'Today';
+        if (now.toDateString() === yesterday.toDateString()) dateStr = 'Yesterday';
+        else if (now.getFullYear() !== today.getFullYear()) dateStr = now.toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
+        else dateStr = now.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
+        
+        const separator = document.createElement("div");
+        separator.className = "date-separator";
+        separator.textContent = dateStr;
+        chatBox.appendChild(separator);
+        lastMessageDate = now.toDateString();
+    }
+    
+    const messageGroup = document.createElement("div");
+    messageGroup.className = "message-group " + (isUser ? "user" : "bot");
+    
+    const wrapper = document.createElement("div");
+    wrapper.className = "message-wrapper";
+    
+    const msgDiv = document.createElement("div");
+    msgDiv.className = isUser ? "user-msg" : "bot-msg";
+    msgDiv.textContent = text;
+    
+    const timeDiv = document.createElement("div");
+    timeDiv.className = "msg-time";
+    timeDiv.textContent = getTime();
+    
+    wrapper.appendChild(msgDiv);
+    wrapper.appendChild(timeDiv);
+    messageGroup.appendChild(wrapper);
+    chatBox.appendChild(messageGroup);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return msgDiv;
+}
+
+// Server keeps the conversation per session, so follow-up questions work
+const sessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2);
+
+async function send(){
+    let msg = msgInput.value.trim();
+    if(!msg) return;
+    addMessage(msg, true);
+    msgInput.value = "";
+    
+    // Answer arrives as Server-Sent Events; append each token as it comes in
+    const botMsg = addMessage("", false);
+    try {
+        const res = await fetch("/chat/stream", {
+            method:"POST",
+            headers:{"Content-Type":"application/json"},
+            body:JSON.stringify({message:msg, session_id:sessionId})
+        });
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split("\n\n");
+            buffer = events.pop();
+            events.forEach(evt => {
+                const line = evt.split("\n").find(l => l.startsWith("data: "));
+                if (!line) return;
+                const data = JSON.parse(line.slice(6));
+                if (data.token) botMsg.textContent += data.token;
+                if (data.error) botMsg.textContent = "Error: " + data.error;
+            });
+            chatBox.scrollTop = chatBox.scrollHeight;
+        }
+    } catch (err) {
+        botMsg.textContent = "Error: " + err;
+    }
+}
+
+msgInput.addEventListener("keypress", (e) => {
+    if(e.key === "Enter" && !e.shiftKey) {
+        e.preventDefault();
+        send();
+    }
+});
+
+initEmojis();